@@ -23,6 +23,15 @@ except Exception as e:  # pragma: no cover
     ReportDataPreparator = None
 
 
+def split_cell_lines(text: str) -> List[str]:
+    """
+    複数回答セルの文字列を改行（\\r / \\n）で分割します（空要素を含みうるため、呼び出し側で除外してください）。
+
+    正規表現を使わず、文字列の置換と分割だけで行います。
+    """
+    return text.replace("\r", "\n").split("\n")
+
+
 def fill_ac14(template_path: Union[str, Path], output_path: Union[str, Path], value: str = "xxx") -> Path:
     """
     report_template.xlsx を読み込み、シート p1 の AC14 セルを指定値に更新して保存します。
@@ -130,13 +139,13 @@ def get_survey_data_value(survey_data_type: str, processed_data: 'ProcessedData'
                 if not cell_str:
                     return 0
                 # 改行区切りで分割
-                import re as _re
-                parts = _re.split(r"[\r\n]+", cell_str)
+                parts = split_cell_lines(cell_str)
                 choices = [p.strip() for p in parts if p.strip()]
                 return len(choices)
             
             # 指定回数の選択肢を選んだ人数をカウント
-            choice_counts = df[qcol].apply(count_choices_in_cell)
+            # （設問列は Arrow 文字列型のことがあり、空の Series に apply すると文字列型のまま返るため、結果の型を明示する）
+            choice_counts = df[qcol].apply(count_choices_in_cell).astype("int64")
             return int((choice_counts == target_count).sum())
         elif survey_data_type == "multiple":
             # 複数選択肢をすべて選択した回答者数
@@ -200,8 +209,7 @@ def get_survey_data_value(survey_data_type: str, processed_data: 'ProcessedData'
                 if not cell_str:
                     return False
                 
-                import re as _re
-                parts = _re.split(r"[\r\n]+", cell_str)
+                parts = split_cell_lines(cell_str)
                 choices_in_cell = [p.strip() for p in parts if p.strip()]
                 choices_set = set(choices_in_cell)
                 
@@ -224,7 +232,7 @@ def get_survey_data_value(survey_data_type: str, processed_data: 'ProcessedData'
                 result = []
                 for grade in order:
                     grade_df = df[df["grade_2024"] == grade]
-                    mask = grade_df[qcol].apply(contains_all_choices)
+                    mask = grade_df[qcol].apply(contains_all_choices).astype(bool)
                     count = int(mask.sum())
                     result.append(count)
                 return result
@@ -238,14 +246,14 @@ def get_survey_data_value(survey_data_type: str, processed_data: 'ProcessedData'
                 result = []
                 for region in order:
                     region_df = df[df["region_bucket"] == region]
-                    mask = region_df[qcol].apply(contains_all_choices)
+                    mask = region_df[qcol].apply(contains_all_choices).astype(bool)
                     count = int(mask.sum())
                     result.append(count)
                 return result
                 
             else:
                 # 全体の集計（単一値を返す）
-                mask = df[qcol].apply(contains_all_choices)
+                mask = df[qcol].apply(contains_all_choices).astype(bool)
                 return int(mask.sum())
         else:
             raise ValueError(f"不明な survey_data_type: {survey_data_type}")
@@ -392,8 +400,7 @@ def get_survey_data_series(series_type: str, processed_data: 'ProcessedData' = N
                     if not cell_str:
                         return False
                     
-                    import re as _re
-                    parts = _re.split(r"[\r\n]+", cell_str)
+                    parts = split_cell_lines(cell_str)
                     choices_in_cell = [p.strip() for p in parts if p.strip()]
                     
                     # マッピング対応の選択肢解決
@@ -414,17 +421,16 @@ def get_survey_data_series(series_type: str, processed_data: 'ProcessedData' = N
                         cell_str = str(cell_value).strip()
                         if not cell_str:
                             return 0
-                        import re as _re
-                        parts = _re.split(r"[\r\n]+", cell_str)
+                        parts = split_cell_lines(cell_str)
                         choices = [p.strip() for p in parts if p.strip()]
                         return len(choices)
                     
                     # 指定された選択数の回答者のみをフィルタリング
-                    choice_counts = df_subset[qcol].apply(count_choices_in_cell)
+                    choice_counts = df_subset[qcol].apply(count_choices_in_cell).astype("int64")
                     df_subset = df_subset[choice_counts == select_count]
                 
                 # より効率的: copyを避けてSeriesで処理
-                choice_mask = df_subset[qcol].apply(contains_choice)
+                choice_mask = df_subset[qcol].apply(contains_choice).astype(bool)
                 
                 # マスクを使って該当行のみを集計
                 valid_rows = df_subset[choice_mask]
@@ -433,7 +439,7 @@ def get_survey_data_series(series_type: str, processed_data: 'ProcessedData' = N
                     return [0] * len(class_order)
                 
                 # グループ化して一括集計
-                result = valid_rows.groupby(class_col).size().reindex(class_order, fill_value=0)
+                result = valid_rows.groupby(class_col, observed=True).size().reindex(class_order, fill_value=0)
                 
                 return [int(x) for x in result.tolist()]
 
@@ -450,8 +456,7 @@ def get_survey_data_series(series_type: str, processed_data: 'ProcessedData' = N
                 s = str(val).strip()
                 if not s:
                     return set()
-                import re as _re
-                parts = _re.split(r"[\r\n]+", s)
+                parts = split_cell_lines(s)
                 return {p.strip() for p in parts if p.strip()}
 
             # 高速集計（ベクトル化処理）
@@ -482,8 +487,7 @@ def get_survey_data_series(series_type: str, processed_data: 'ProcessedData' = N
                     if not cell_str:
                         return False
                     
-                    import re as _re
-                    parts = _re.split(r"[\r\n]+", cell_str)
+                    parts = split_cell_lines(cell_str)
                     choices_in_cell = [p.strip() for p in parts if p.strip()]
                     
                     # マッピング対応の選択肢解決
@@ -505,17 +509,16 @@ def get_survey_data_series(series_type: str, processed_data: 'ProcessedData' = N
                         cell_str = str(cell_value).strip()
                         if not cell_str:
                             return 0
-                        import re as _re
-                        parts = _re.split(r"[\r\n]+", cell_str)
+                        parts = split_cell_lines(cell_str)
                         choices = [p.strip() for p in parts if p.strip()]
                         return len(choices)
                     
                     # 指定された選択数の回答者のみをフィルタリング
-                    choice_counts = df[qcol].apply(count_choices_in_cell)
+                    choice_counts = df[qcol].apply(count_choices_in_cell).astype("int64")
                     df_filtered = df[choice_counts == select_count]
                 
                 # 選択肢マッチング
-                choice_mask = df_filtered[qcol].apply(contains_choice)
+                choice_mask = df_filtered[qcol].apply(contains_choice).astype(bool)
                 count = int(choice_mask.sum())
                 return [count]
 
@@ -631,8 +634,7 @@ def get_survey_data_series(series_type: str, processed_data: 'ProcessedData' = N
                         if not cell_str:
                             return False
                         
-                        import re as _re
-                        parts = _re.split(r"[\r\n]+", cell_str)
+                        parts = split_cell_lines(cell_str)
                         choices_in_cell = [p.strip() for p in parts if p.strip()]
                         
                         # マッピング対応の選択肢解決
@@ -640,7 +642,7 @@ def get_survey_data_series(series_type: str, processed_data: 'ProcessedData' = N
                         return matched_choice is not None
                     
                     # 該当する回答数をカウント
-                    choice_count = df_subset[qcol].apply(contains_choice).sum()
+                    choice_count = df_subset[qcol].apply(contains_choice).astype(bool).sum()
                     ratio = float(choice_count) / float(total_responses)
                     ratios.append(ratio)
                 
@@ -5,7 +5,7 @@ import sys
 from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
-from typing import Any, List, Dict
+from typing import Any, Dict, Iterator, List
 
 import pandas as pd
 
@@ -120,10 +120,14 @@ def extract_rows(df: pd.DataFrame) -> List[Dict[str, Any]]:
 
 
 def build_html(data: List[Dict[str, Any]]) -> str:
+    return "".join(build_html_parts(data))
+
+
+def build_html_parts(data: List[Dict[str, Any]]) -> Iterator[str]:
     # Build a self-contained HTML with embedded JSON, sortable and filterable per column (vanilla JS)
+    # 行データ部分（回答者数に比例して大きくなる）は前後と連結せず、単独の断片として返す
     columns = ['生年月日', '学年', '都道府県', '市区町村'] + LEARNING_OPTIONS + ['回答数']
-    json_data = json.dumps(data, ensure_ascii=False)
-    return f"""<!doctype html>
+    yield f"""<!doctype html>
 <html lang=\"ja\">
 <head>
   <meta charset=\"utf-8\" />
@@ -160,7 +164,9 @@ def build_html(data: List[Dict[str, Any]]) -> str:
     </table>
   </div>
   <script>
-    const DATA = {json.dumps({'rows': data}, ensure_ascii=False)}.rows; // embedded
+    const DATA = """
+    yield json.dumps({'rows': data}, ensure_ascii=False)
+    yield f""".rows; // embedded
     const COLUMNS = {json.dumps(columns, ensure_ascii=False)};
 
     const state = {{ sortKey: null, sortDir: 'asc', filters: Object.fromEntries(COLUMNS.map(c => [c, ''])), excludeNonTarget: false }};
@@ -289,15 +295,21 @@ def generate(output_path: Path | None = None) -> Path:
     # Use df_original which contains computed columns and includes all respondents
     rows = extract_rows(processed.df_original)
 
-    html = build_html(rows)
-
     if output_path is None:
         output_path = Path(__file__).parent / 'respondents.html'
     else:
         output_path = Path(output_path)
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html)
+    # 文書全体の文字列は作らず、断片ごとにファイルへ書き出す
+    # （途中で失敗しても既存の出力を壊さないよう、一時ファイルに書いてから置き換える）
+    tmp_path = f"{output_path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(build_html_parts(rows))
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, output_path)
 
     return output_path
 
@@ -1,16 +1,41 @@
 # Standard library
+import glob
+import html
 import os
 import re
+import string
 import traceback
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
+from functools import lru_cache
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 
 # Third-party
 import numpy as np
 import pandas as pd
 
+# 任意: pyarrow があれば文字列列を Arrow 文字列型にして .str 系の処理を高速化する
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+    STRING_DTYPE: Optional[str] = "string[pyarrow]"
+except ImportError:
+    HAS_PYARROW = False
+    STRING_DTYPE = None
+
+# 任意: python-calamine があれば Excel を Rust 実装のパーサーで読み込む（未導入時・pandas 2.2 未満は openpyxl）
+try:
+    import python_calamine  # noqa: F401
+    HAS_CALAMINE = tuple(int(v) for v in pd.__version__.split(".")[:2]) >= (2, 2)
+except ImportError:
+    HAS_CALAMINE = False
+
+# Copy-on-Write を有効化（列追加時の不要なコピーを避ける。pandas 3 以降は既定で有効）
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # 簡易 .env ローダー（外部依存なし）
 # 優先順位: 既存の環境変数 > .env(CWD) > .env(リポジトリルート)
 def _load_env_from_dotenv():
@@ -46,8 +71,46 @@ def _load_env_from_dotenv():
 _load_env_from_dotenv()
 
 # 1) 読み込み
-survey_file = os.getenv("SURVEY_EXCEL_FILE", "survey.xlsx")
-df = pd.read_excel(Path(__file__).parent / survey_file, engine="openpyxl")
+# openpyxl は読み取り専用・値のみ（数式・書式の DOM を構築しない）で開く
+# （pandas 1.5 以降の openpyxl エンジンの既定と同じだが、前提として明示しておく）
+EXCEL_READ_KWARGS = {"engine": "openpyxl", "engine_kwargs": {"read_only": True, "data_only": True}}
+
+def excel_read_kwargs() -> dict:
+    """read_excel のエンジン指定（SURVEY_EXCEL_ENGINE=openpyxl で calamine を使わない）"""
+    if HAS_CALAMINE and os.getenv("SURVEY_EXCEL_ENGINE", "calamine") == "calamine":
+        return {"engine": "calamine"}
+    return EXCEL_READ_KWARGS
+
+# REPORT_PARQUET_CACHE=1 のとき、Excel の読み込み結果を隣に Parquet で保存し、
+# Excel が更新されていなければ（更新時刻・サイズが同じなら）次回以降は Parquet から読む（要 pyarrow）
+def read_survey_excel(path: Path) -> pd.DataFrame:
+    read_kwargs = excel_read_kwargs()
+    if not HAS_PYARROW or os.getenv("REPORT_PARQUET_CACHE", "0") != "1":
+        return pd.read_excel(path, **read_kwargs)
+    stat = path.stat()
+    cache_path = path.with_name(f"{path.name}.{stat.st_mtime_ns}-{stat.st_size}.parquet")
+    if cache_path.exists():
+        frame = pd.read_parquet(cache_path)
+        # Parquet の欠損は文字列列で None になるため、read_excel と同じ NaN に揃える
+        obj_cols = frame.select_dtypes(include="object").columns
+        frame[obj_cols] = frame[obj_cols].where(frame[obj_cols].notna(), np.nan)
+        return frame
+    frame = pd.read_excel(path, **read_kwargs)
+    # 書き込み途中のファイルを次回の実行が読まないよう、一時ファイル経由で置き換える
+    tmp_path = cache_path.with_name(f"{cache_path.name}.tmp")
+    try:
+        frame.to_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        # 型が混在した列など Parquet にできない場合はキャッシュせずに続行
+        tmp_path.unlink(missing_ok=True)
+        return frame
+    # Excel 更新前の古いキャッシュは二度と使われないため削除する
+    for stale in path.parent.glob(f"{glob.escape(path.name)}.*-*.parquet"):
+        if stale != cache_path:
+            stale.unlink(missing_ok=True)
+    return frame
+
 
 # 2) 「回答」列の例外的な処理（仕様変更後）
 # 仕様：
@@ -59,26 +122,28 @@ df = pd.read_excel(Path(__file__).parent / survey_file, engine="openpyxl")
 # - 元の列順（cols）から新しい列名リスト（new_names）を構成して一括 rename することで副作用を防ぐ
 # - 他の列はそのまま
 
+def is_answer_column(name: str) -> bool:
+    """「回答」列か（重複名は pandas により 回答.1, 回答.2 ... となる。正規表現は使わず接頭辞と数字で判定）"""
+    return name == "回答" or (name.startswith("回答.") and name[3:].isdecimal())
+
 def map_answer_columns(frame: pd.DataFrame) -> pd.DataFrame:
-    cols = list(frame.columns)
-    new_names = list(cols)  # 初期は同名
+    cols = frame.columns
+    is_answer = np.array([is_answer_column(name) for name in cols.astype(str)], dtype=bool)
+    # 先頭が回答なら変更不可、スキップ
+    answer_pos = np.flatnonzero(is_answer[1:]) + 1
+    if len(answer_pos) == 0:
+        return frame
 
-    for i, c in enumerate(cols):
-        if c == "回答" or re.match(r"^回答\.\d+$", str(c)):
-            if i == 0:
-                # 先頭が回答なら変更不可、スキップ
-                continue
-            original_left = cols[i - 1]
-            # 左列は補足説明プレフィックスを付ける
-            new_names[i - 1] = f"補足説明{original_left}"
-            # 回答列は左列の元名にする
-            new_names[i] = original_left
+    new_names = cols.to_numpy(dtype=object).copy()  # 初期は同名
+    original_left = new_names[answer_pos - 1].copy()
+    # 回答列は左列の元名にする
+    new_names[answer_pos] = original_left
+    # 左列は補足説明プレフィックスを付ける（「回答」が連続する場合は、左列としての改名を優先）
+    new_names[answer_pos - 1] = [f"補足説明{c}" for c in original_left]
 
     # 重複名が発生する可能性はあるが仕様上許容する（必要なら後段で個別対応）
-    rename_map = {old: new for old, new in zip(cols, new_names) if old != new}
-    return frame.rename(columns=rename_map)
+    return frame.set_axis(new_names, axis=1)
 
-df = map_answer_columns(df)
 
 # 2.5) ランキング質問の集約処理
 def aggregate_ranking_questions(frame: pd.DataFrame) -> pd.DataFrame:
@@ -120,26 +185,52 @@ def aggregate_ranking_questions(frame: pd.DataFrame) -> pd.DataFrame:
     
     return frame
 
-df = aggregate_ranking_questions(df)
 
 # 3) 文字列のトリミング・NaN整備（最低限）
+# 全角スペース→半角は正規表現ではなく固定文字列の置換で行う
+# pyarrow があれば文字列化の時点で Arrow 文字列型にし、置換・strip・比較を Arrow の計算カーネルで行う（欠損は NA のまま）
 def strip_series(s: pd.Series) -> pd.Series:
-    return s.astype(str).str.replace(r"\u3000", " ", regex=True).str.strip().replace({"nan": np.nan})
-for c in df.columns:
-    if df[c].dtype == object:
-        df[c] = strip_series(df[c])
+    stripped = s.astype(STRING_DTYPE or str).str.replace("\u3000", " ", regex=False).str.strip()
+    return stripped.mask(stripped.eq("nan"))
+
+def strip_object_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    obj_cols = frame.select_dtypes(include="object").columns
+    if len(obj_cols) > 0:
+        frame[obj_cols] = frame[obj_cols].apply(strip_series)
+    return frame
+
 
 # 4) 生年月日を日時化（yyyyMMddやExcel数値に耐える）
+YYYYMMDD_RE = re.compile(r"\d{8}")
+
 def parse_birth(x):
     if pd.isna(x): return pd.NaT
     if isinstance(x, (int, float)) and not pd.isna(x):
         s = str(int(x))
         return pd.to_datetime(s, format="%Y%m%d", errors="coerce")
-    if isinstance(x, str) and re.fullmatch(r"\d{8}", x):
+    if isinstance(x, str) and YYYYMMDD_RE.fullmatch(x):
         return pd.to_datetime(x, format="%Y%m%d", errors="coerce")
     return pd.to_datetime(x, errors="coerce")
 
-df["birth_dt"] = df["生年月日"].apply(parse_birth)
+def parse_birth_series(series: pd.Series) -> pd.Series:
+    """parse_birth の列版（行ごとの apply を使わず、列全体をまとめて日時化）"""
+    # 数値列: yyyyMMdd の数値として解釈
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        digits = series.dropna().astype("int64").astype(str)
+        return pd.to_datetime(digits, format="%Y%m%d", errors="coerce").reindex(series.index)
+    # すでに日時の列（Excelの日付セルのみ）: 文字列化・書式判定をせずにそのまま使う
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if pd.api.types.infer_dtype(series, skipna=True) in ("datetime", "datetime64"):
+        return pd.to_datetime(series, errors="coerce")
+    # 文字列列: 8桁数字は yyyyMMdd、それ以外は要素ごとに書式を推定して解釈
+    # （文字列化は1回だけ行い、判定と yyyyMMdd の解釈で使い回す）
+    present = series.notna()
+    as_text = series.astype(str)
+    is_yyyymmdd = as_text.str.fullmatch(YYYYMMDD_RE.pattern).astype(bool) & present
+    dt_yyyymmdd = pd.to_datetime(as_text[is_yyyymmdd], format="%Y%m%d", errors="coerce")
+    dt_other = pd.to_datetime(series[present & ~is_yyyymmdd], format="mixed", errors="coerce")
+    return pd.concat([dt_yyyymmdd, dt_other]).reindex(series.index)
 
 # 5) 2024年度の「4/1時点学年」を算出
 FISCAL_YEAR = int(os.getenv("FISCAL_YEAR", "2024"))
@@ -160,22 +251,71 @@ def grade_ja_on_april1(birth_dt):
     }
     return mapping.get(a, "対象外")
 
-df["grade_2024"] = df["birth_dt"].apply(grade_ja_on_april1)
+# 4/1時点の年齢 → 学年
+GRADE_BY_AGE = {
+    6: "小1", 7: "小2", 8: "小3", 9: "小4", 10: "小5", 11: "小6",
+    12: "中1", 13: "中2", 14: "中3"
+}
+# 区分列は取りうる値が決まっているため、カテゴリ型（整数コード）で持って集計時の文字列比較・ハッシュを避ける
+GRADE_DTYPE = pd.CategoricalDtype(list(GRADE_BY_AGE.values()) + ["対象外", "不明"])
+# 年齢（添字）→ 学年のカテゴリコードの表（表の範囲外の年齢は「対象外」）
+GRADE_CODE_OUT_OF_RANGE = GRADE_DTYPE.categories.get_loc("対象外")
+GRADE_CODE_UNKNOWN = GRADE_DTYPE.categories.get_loc("不明")
+GRADE_CODE_BY_AGE = np.full(max(GRADE_BY_AGE) + 1, GRADE_CODE_OUT_OF_RANGE, dtype=np.int8)
+for _age, _grade in GRADE_BY_AGE.items():
+    GRADE_CODE_BY_AGE[_age] = GRADE_DTYPE.categories.get_loc(_grade)
+
+def age_on_series(birth: pd.Series, ref: pd.Timestamp) -> pd.Series:
+    """age_on の列版（生年月日が不明な行は NaN）"""
+    before_birthday = (birth.dt.month * 100 + birth.dt.day) > (ref.month * 100 + ref.day)
+    return ref.year - birth.dt.year - before_birthday.astype(int)
+
+def grade_ja_on_april1_series(birth: pd.Series, april1: pd.Timestamp) -> pd.Series:
+    """grade_ja_on_april1 の列版"""
+    return grade_from_age_series(age_on_series(birth, april1))
+
+def grade_from_age_series(age_series: pd.Series) -> pd.Series:
+    """4/1時点の年齢の列 → 学年（年齢を算出済みの場合はこちらを使い、再計算を避ける）"""
+    # 年齢から表引きでカテゴリコードを直接求める（学年文字列の Series は作らない）
+    age = age_series.to_numpy(dtype=float)
+    known = ~np.isnan(age)
+    in_table = known & (age >= 0) & (age < len(GRADE_CODE_BY_AGE))
+    codes = np.where(known, GRADE_CODE_OUT_OF_RANGE, GRADE_CODE_UNKNOWN).astype(np.int8)
+    codes[in_table] = GRADE_CODE_BY_AGE[age[in_table].astype(np.int64)]
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=GRADE_DTYPE), index=age_series.index)
 
-# 未就学児（2024/04/01時点で6歳未満）を除外するための年齢計算とフィルタ
-# age_onはNaNを返すことがあるため、いったん列にしてから判定
-df["age_2024"] = df["birth_dt"].apply(lambda d: age_on(d, APRIL1))
-# 未就学児: 年齢が6歳未満、または学年が不明（生年月日不明等）に加えて「対象外」も除外
-preschool_mask = (
-    (df["age_2024"].notna() & (df["age_2024"] < 6))
-    | (df["grade_2024"] == "不明")
-    | (df["grade_2024"] == "対象外")
-)
 
-# 除外数（「組」=1行1組想定）
-n_preschool = int(preschool_mask.sum())
-# 集計に用いる有効データ
-df_eff = df.loc[~preschool_mask].copy()
+# 設問一覧を返す関数
+# - 除外: 性別, 生年月日, 郵便番号, 都道府県, 市区町村
+# - 除外: 列名が「補足説明」で始まる列
+# - 除外: 集計のためにプログラム上で作成したアルファベットの列（ASCII識別子の列名）
+#   例: birth_dt, grade_2024, age_2024, region_bucket, gender_norm, school_level など
+# - 入力DataFrame中の列順を維持して返す
+
+# 集計・レポートで一切参照しない元データの列（申込情報など）
+UNUSED_SOURCE_COLUMNS = {"郵便番号", "詳細タイトル名", "申込人数（受験生）", "申込人数（保護者等）"}
+ASCII_IDENTIFIER_PATTERN = r"[A-Za-z_][A-Za-z0-9_]*"
+
+def get_question_columns(frame: pd.DataFrame) -> list:
+    excluded_exact = {"性別", "生年月日", "都道府県", "市区町村"} | UNUSED_SOURCE_COLUMNS
+
+    # 列名を文字列にして、除外条件を列名全体に対してまとめて判定する
+    # （ASCII識別子: 先頭は英字またはアンダースコア、以降は英数字またはアンダースコアのみ）
+    col_names = frame.columns.astype(str)
+    excluded = (
+        col_names.isin(excluded_exact)
+        | col_names.str.startswith("補足説明")
+        | col_names.str.fullmatch(ASCII_IDENTIFIER_PATTERN)
+    )
+    return col_names[~np.asarray(excluded, dtype=bool)].tolist()
+
+# 有効データに持ち越す列（属性列＋設問列）。補足説明列や申込情報などの列は持ち越さない
+EFFECTIVE_BASE_COLUMNS = ["性別", "都道府県", "市区町村", "birth_dt", "grade_2024", "age_2024"]
+
+def effective_column_mask(frame: pd.DataFrame, question_columns: list) -> np.ndarray:
+    # 重複した列名があっても列の並び・本数が変わらないよう、列ごとの真偽値で選ぶ
+    return frame.columns.isin(EFFECTIVE_BASE_COLUMNS + list(question_columns))
+
 
 # 6) 地域区分（東京23区 / 三多摩島しょ / 埼玉 / 神奈川 / 千葉 / その他）
 TOKYO_23 = {
@@ -184,6 +324,7 @@ TOKYO_23 = {
     "足立区","葛飾区","江戸川区"
 }
 def region_bucket(pref, city):
+    if pd.isna(pref): return "その他"
     if pref == "東京都":
         if isinstance(city, str) and any(city.startswith(ku) for ku in TOKYO_23):
             return "東京23区"
@@ -193,74 +334,78 @@ def region_bucket(pref, city):
     if pref == "千葉県": return "千葉県"
     return "その他"
 
-df_eff["region_bucket"] = [region_bucket(p, c) for p, c in zip(df_eff.get("都道府県"), df_eff.get("市区町村"))]
-
-# 7) 複数回答の縦持ち化（例: 情報経路・習い事）
-def split_multiselect(series: pd.Series) -> pd.Series:
-    return (
-        series.fillna("")
-        .str.replace("\r\n", "\n")
-        .str.split(r"[\n]+", regex=True)
-        .apply(lambda xs: [x.strip() for x in xs if x and x.strip()])
-    )
+# region_bucket の列版（23区判定は区名の前方一致を1本の正規表現で一括判定）
+TOKYO_23_RE = re.compile("^(?:" + "|".join(map(re.escape, sorted(TOKYO_23))) + ")")
+REGION_BUCKETS = ["埼玉県", "神奈川県", "千葉県"]
+REGION_DTYPE = pd.CategoricalDtype(["東京23区", "三多摩島しょ"] + REGION_BUCKETS + ["その他"])
+
+def region_bucket_series(pref: pd.Series, city: pd.Series) -> pd.Series:
+    categories = REGION_DTYPE.categories
+    # 都道府県もユニーク値ごとに区分コードを決めて行へ展開する（東京都は市区町村で分けるため仮に -1、欠損は「その他」）
+    pref_codes, pref_uniques = pd.factorize(pref)
+    code_by_pref = [
+        -1 if p == "東京都" else categories.get_loc(p) if p in REGION_BUCKETS else categories.get_loc("その他")
+        for p in pref_uniques
+    ]
+    pref_region = np.array(code_by_pref + [categories.get_loc("その他")], dtype=np.int8)[pref_codes]
+    is_tokyo = pref_region == -1
+    # 市区町村名は重複が多いため、ユニーク値だけを正規表現で判定して行へ展開する
+    # （欠損はコード -1 となり、末尾に追加した False を引く）
+    city_codes, city_uniques = pd.factorize(city)
+    city_uniques = pd.Series(city_uniques)
+    if not pd.api.types.is_string_dtype(city_uniques):
+        city_uniques = city_uniques.astype(str)
+    is_23_unique = city_uniques.str.match(TOKYO_23_RE.pattern).to_numpy(dtype=bool)
+    is_23 = np.append(is_23_unique, False)[city_codes]
+    # 区分名ではなくカテゴリコードを選び、そのままカテゴリ型の列にする
+    tokyo_codes = np.where(is_23, categories.get_loc("東京23区"), categories.get_loc("三多摩島しょ")).astype(np.int8)
+    region_codes = np.where(is_tokyo, tokyo_codes, pref_region)
+    return pd.Series(pd.Categorical.from_codes(region_codes, dtype=REGION_DTYPE), index=pref.index)
 
-# 列名は実ファイルに合わせてください（例に基づく想定）
-col_channel = "本イベントを何でお知りになりましたか？（複数回答可）"
-col_learning = "現在習い事や塾などに通われていますか？（複数回答可）"
 
-df_eff["channel_list"] = split_multiselect(df_eff.get(col_channel))
-df_eff["learning_list"] = split_multiselect(df_eff.get(col_learning))
+# 7) 複数回答の縦持ち化（例: 情報経路・習い事）
+# 改行区切りの各要素を、前後の空白を除いた非空トークンとして1回の正規表現走査で抽出する
+# （\r\n の \r も前後空白として落ちるため、改行コードの置換や行ごとの後処理は不要）
+MULTISELECT_TOKEN_PATTERN = r"\S(?:[^\n]*\S)?"
+# 設問の選択肢抽出用（\r / \n のどちらでも区切る）
+OPTION_TOKEN_PATTERN = r"\S(?:[^\r\n]*\S)?"
 
-channel_long = (
-    df_eff[["性別", "region_bucket", "grade_2024", "channel_list"]]
-    .explode("channel_list", ignore_index=True)
-    .rename(columns={"channel_list": "channel"})
-)
-channel_long = channel_long[channel_long["channel"].notna() & (channel_long["channel"] != "")]
+def split_multiselect(series: pd.Series) -> pd.Series:
+    return series.fillna("").str.findall(MULTISELECT_TOKEN_PATTERN)
 
-# 8) 集計例（全体／地域別／学年別）
-# 全体トップN（情報経路）
-top_channel_overall = (
-    channel_long["channel"].value_counts().head(10)
-)
+def explode_multiselect(series: pd.Series) -> pd.Series:
+    """複数回答を1トークン1行に展開する（インデックスは元の行ラベルを保持）"""
+    # 同じ回答のセルが多いため、トークン分割はユニークなセル値ごとに1回だけ行い、行へは整数コードで展開する
+    codes, uniques = pd.factorize(series)
+    tokens = pd.Series(uniques, dtype=object).str.findall(MULTISELECT_TOKEN_PATTERN).explode().dropna()
+    # ユニーク値ごとのトークン数（欠損のコード -1 は末尾の 0 を引く）
+    n_tokens = np.bincount(tokens.index.to_numpy(dtype=np.int64), minlength=len(uniques) + 1)
+    rows = np.flatnonzero(n_tokens[codes] > 0)
+    # 重複ラベルの .loc は各コードのトークンをセル内の順にまとめて返す
+    return tokens.loc[codes[rows]].set_axis(series.index[np.repeat(rows, n_tokens[codes[rows]])])
 
-# 地域別クロス（情報経路 × 地域）
-channel_by_region = pd.crosstab(channel_long["channel"], channel_long["region_bucket"])
 
-# 学年別（小1〜中3に限定）
-grades_order = ["小1","小2","小3","小4","小5","小6","中1","中2","中3"]
-channel_by_grade = (
-    pd.crosstab(channel_long["channel"], channel_long["grade_2024"])
-    [ [g for g in grades_order if g in channel_long["grade_2024"].unique()] ]
-)
+# クロス集計（pd.crosstab 相当）を groupby().size().unstack() で行う
+# （カテゴリ型の列は出現した組み合わせのみ。行・列の並びはカテゴリ順）
+def count_table(frame: pd.DataFrame, index: str, columns) -> pd.DataFrame:
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    return frame.groupby([index] + columns, observed=True).size().unstack(columns, fill_value=0)
 
-# 9) HTMLレポート（A4縦）出力 — サマリ（回答人数／男女比／小学校・中学校比）
+# 複数の属性で1回だけ集計した件数（groupby().size()）から、一部の属性のクロス集計表を周辺和で求める
+DEMOGRAPHIC_KEYS = ["gender_norm", "region_bucket", "school_level"]
 
-# 設問一覧を返す関数
-# - 除外: 性別, 生年月日, 郵便番号, 都道府県, 市区町村
-# - 除外: 列名が「補足説明」で始まる列
-# - 除外: 集計のためにプログラム上で作成したアルファベットの列（ASCII識別子の列名）
-#   例: birth_dt, grade_2024, age_2024, region_bucket, channel_list, learning_list, gender_norm, school_level など
-# - 入力DataFrame中の列順を維持して返す
+def marginal_table(counts: pd.Series, index: str, columns) -> pd.DataFrame:
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    return counts.groupby(level=[index] + columns, observed=True).sum().unstack(columns, fill_value=0)
 
-def get_question_columns(frame: pd.DataFrame) -> list:
-    excluded_exact = {"性別", "生年月日", "郵便番号", "都道府県", "市区町村", "詳細タイトル名", "申込人数（受験生）", "申込人数（保護者等）"}
+# カテゴリ型の列の件数を {カテゴリ: 件数} で返す（整数コードを bincount で数える。出現しないカテゴリは 0）
+def category_counts(series: pd.Series) -> Dict[str, int]:
+    codes = series.cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+    return dict(zip(series.cat.categories, counts.tolist()))
 
-    def is_ascii_identifier(name: str) -> bool:
-        # 先頭は英字またはアンダースコア、以降は英数字またはアンダースコアのみ
-        return re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", str(name)) is not None
 
-    questions = []
-    for col in frame.columns:
-        col_str = str(col)
-        if col_str in excluded_exact:
-            continue
-        if col_str.startswith("補足説明"):
-            continue
-        if is_ascii_identifier(col_str):
-            continue
-        questions.append(col_str)
-    return questions
+# 9) HTMLレポート（A4縦）出力 — サマリ（回答人数／男女比／小学校・中学校比）
 
 # 設問の選択肢一覧を返す関数
 # - パラメータ: question_col = 設問の列名（文字列）
@@ -272,29 +417,20 @@ def get_question_options(frame: pd.DataFrame, question_col: str) -> list:
     if question_col not in frame.columns:
         return []
     series = frame[question_col]
-    # 文字列化とNaN除去
-    series = series.dropna().astype(str)
-    seen = set()
-    options = []
-    for cell in series:
-        cell = cell.strip()
-        if not cell:
-            continue
-        # 改行で分割（複数回答セルに対応）。改行が無ければそのまま1件として扱う
-        parts = re.split(r"[\r\n]+", cell)
-        for p in parts:
-            s = p.strip()
-            if not s:
-                continue
-            if s not in seen:
-                seen.add(s)
-                options.append(s)
+    # 文字列化とNaN除去後、改行で分割（複数回答セルに対応）した非空の選択肢をユニーク化
+    # 同じ回答のセルが多いため、分割はユニークなセル値に対してだけ行う
+    cells = pd.Series(series.dropna().unique())
+    tokens = cells.astype(str).str.findall(OPTION_TOKEN_PATTERN).explode().dropna()
+    # 直後にソートするため初出順は保持せず、集合で重複を除く（トークンは findall 由来の str）
+    options = set(tokens.tolist())
     # ソート: 辞書順。ただし「その他」は常に最後に配置
     def sort_key(x: str):
         return (1 if x == "その他" else 0, x)
     options_sorted = sorted(options, key=sort_key)
     return options_sorted
 
+GENDER_DTYPE = pd.CategoricalDtype(["男性", "女性", "未回答・その他"])
+
 def normalize_gender(x: str) -> str:
     if pd.isna(x) or str(x).strip() == "":
         return "未回答・その他"
@@ -305,13 +441,19 @@ def normalize_gender(x: str) -> str:
         return "女性"
     return "未回答・その他"
 
-# 性別の正規化
-if "性別" in df_eff.columns:
-    df_eff["gender_norm"] = df_eff["性別"].apply(normalize_gender)
-else:
-    df_eff["gender_norm"] = "未回答・その他"
+def gender_norm_series(gender: pd.Series) -> pd.Series:
+    """normalize_gender の列版"""
+    # 性別の回答は種類が少ないため、ユニーク値だけを normalize_gender で判定してカテゴリコードを行へ展開する
+    # （欠損はコード -1 となり、末尾に追加した「未回答・その他」を引く）
+    gender_codes, gender_uniques = pd.factorize(gender)
+    code_by_value = [GENDER_DTYPE.categories.get_loc(normalize_gender(v)) for v in gender_uniques]
+    lookup = np.array(code_by_value + [GENDER_DTYPE.categories.get_loc("未回答・その他")], dtype=np.int8)
+    return pd.Series(pd.Categorical.from_codes(lookup[gender_codes], dtype=GENDER_DTYPE), index=gender.index)
+
 
 # 小学校/中学校の区分（grade_2024が小x/中xで判定）
+SCHOOL_LEVEL_DTYPE = pd.CategoricalDtype(["小学校", "中学校", "不明"])
+
 def school_level_from_grade(g: str) -> str:
     if pd.isna(g):
         return "不明"
@@ -322,30 +464,143 @@ def school_level_from_grade(g: str) -> str:
         return "中学校"
     return "不明"
 
-df_eff["school_level"] = df_eff["grade_2024"].apply(school_level_from_grade)
+# 学年カテゴリコード → 学校区分カテゴリコードの表（学年の取りうる値は GRADE_DTYPE で決まっている）
+SCHOOL_LEVEL_CODE_BY_GRADE = np.array(
+    [SCHOOL_LEVEL_DTYPE.categories.get_loc(school_level_from_grade(g)) for g in GRADE_DTYPE.categories]
+    + [SCHOOL_LEVEL_DTYPE.categories.get_loc("不明")],  # 欠損（コード -1）用
+    dtype=np.int8,
+)
 
-# 集計（未就学児を除いた有効データに対して）
-n_total = len(df_eff)
+def school_level_series(grade: pd.Series) -> pd.Series:
+    """school_level_from_grade の列版（学年のカテゴリコードから表引き）"""
+    grade_codes = grade.astype(GRADE_DTYPE).cat.codes.to_numpy()
+    return pd.Series(
+        pd.Categorical.from_codes(SCHOOL_LEVEL_CODE_BY_GRADE[grade_codes], dtype=SCHOOL_LEVEL_DTYPE),
+        index=grade.index,
+    )
 
-# 性別
-gender_counts = df_eff["gender_norm"].value_counts().to_dict()
-male = int(gender_counts.get("男性", 0))
-female = int(gender_counts.get("女性", 0))
-other = int(gender_counts.get("未回答・その他", 0))
 
 def pct(n, d):
     return 0 if d == 0 else round(n * 100.0 / d, 1)
 
-# 学校区分
-level_counts = df_eff["school_level"].value_counts().to_dict()
-prim = int(level_counts.get("小学校", 0))
-mid = int(level_counts.get("中学校", 0))
-unknown_lv = int(level_counts.get("不明", 0))
 
-# HTML生成
-now_str = datetime.now().strftime("%Y-%m-%d %H:%M")
+# 数値のフォーマット
+def fmt_int(n: int) -> str:
+    return f"{int(n):,}"
+
+def fmt_int_rows(values) -> List[List[str]]:
+    """整数の2次元配列を、桁区切り文字列の行リストへまとめて変換"""
+    return [[f"{v:,}" for v in row] for row in np.asarray(values, dtype=np.int64).tolist()]
+
+# 地域別HTML行生成（ラベル引きの .loc はせず、行順に並べた値をまとめて取り出して組み立てる）
+def render_region_rows(region_ct: pd.DataFrame, region_row_totals: pd.Series, region_row_pct: pd.Series, labels: list) -> str:
+    cells = fmt_int_rows(np.column_stack([
+        region_ct.reindex(index=labels, columns=["小学校", "中学校"]).to_numpy(),
+        region_row_totals.reindex(labels).to_numpy(),
+    ]))
+    pcts = region_row_pct.reindex(labels).tolist()
+    return "\n".join([
+        f"          <tr>\n            <td class=\"label\">{label}</td>\n            <td>{prim_n}</td>\n            <td>{mid_n}</td>\n            <td>{total}</td>\n            <td>{row_pct}%</td>\n          </tr>"
+        for label, (prim_n, mid_n, total), row_pct in zip(labels, cells, pcts)
+    ])
+
+
+# アンケート Excel の読み込みから男女別・地域別の集計までの一連の処理（旧来のモジュール直下の集計）
+# import しただけでは実行せず、main.df / main.n_total などが初めて参照されたときに __getattr__ から1回だけ実行する
+# （spawn で起動した並列ワーカーなどが import のたびに Excel を読み込み直さないようにするため。
+#   ReportGenerator・ReportDataPreparator はこの結果を使わない）
+def build_module_summary() -> Dict[str, object]:
+    """Excel を読み込んで前処理・集計し、結果（df, df_eff, n_total, ct など）を名前 → 値の辞書で返す"""
+    survey_file = os.getenv("SURVEY_EXCEL_FILE", "survey.xlsx")
+    df = read_survey_excel(Path(__file__).parent / survey_file)
+
+    df = map_answer_columns(df)
+
+    df = aggregate_ranking_questions(df)
+
+    df = strip_object_columns(df)
+
+    # 生年月日・学年・年齢は1回の assign でまとめて追加する
+    # 未就学児（2024/04/01時点で6歳未満）を除外するための年齢も、age_onはNaNを返すことがあるため、いったん列にしてから判定
+    # 学年は算出済みの年齢から表引きする（年齢の計算は1回だけ）
+    _birth_dt = parse_birth_series(df["生年月日"])
+    _age_2024 = age_on_series(_birth_dt, APRIL1)
+    df = df.assign(
+        birth_dt=_birth_dt,
+        grade_2024=grade_from_age_series(_age_2024),
+        age_2024=_age_2024,
+    )
+    # 未就学児: 年齢が6歳未満、または学年が不明（生年月日不明等）に加えて「対象外」も除外
+    preschool_mask = (
+        (df["age_2024"].notna() & (df["age_2024"] < 6))
+        | (df["grade_2024"] == "不明")
+        | (df["grade_2024"] == "対象外")
+    )
+
+    # 除外数（「組」=1行1組想定）
+    n_preschool = int(preschool_mask.sum())
+    # 集計に用いる有効データ（行の絞り込みで新しいフレームになるため .copy() は不要）
+    df_eff = df.loc[~preschool_mask, effective_column_mask(df, get_question_columns(df))]
+
+    df_eff["region_bucket"] = region_bucket_series(df_eff["都道府県"], df_eff["市区町村"])
+
+    # 列名は実ファイルに合わせてください（例に基づく想定）
+    col_channel = "本イベントを何でお知りになりましたか？（複数回答可）"
+    col_learning = "現在習い事や塾などに通われていますか？（複数回答可）"
+
+    # 分割結果（リスト）は df_eff の列として保持せず、そのままトークン列だけを縦持ちにする
+    # 属性列は元の行ラベルで引き当てる
+    channel_tokens = explode_multiselect(df_eff[col_channel])
+    channel_long = (
+        df_eff.loc[channel_tokens.index, ["性別", "region_bucket", "grade_2024"]]
+        .assign(channel=channel_tokens.to_numpy())
+        .reset_index(drop=True)
+    )
+
+    # 8) 集計例（全体／地域別／学年別）
+    # 情報経路 × (地域, 学年) のクロス集計を1回だけ行い、以下はその周辺和から導出する
+    channel_ct = count_table(channel_long, "channel", ["region_bucket", "grade_2024"])
+
+    # 全体トップN（情報経路）
+    top_channel_overall = (
+        channel_ct.sum(axis=1).sort_values(ascending=False, kind="stable").head(10).rename("count")
+    )
+
+    # 地域別クロス（情報経路 × 地域）
+    channel_by_region = channel_ct.T.groupby(level="region_bucket", observed=True).sum().T
+
+    # 学年別（小1〜中3に限定）
+    grades_order = ["小1","小2","小3","小4","小5","小6","中1","中2","中3"]
+    channel_by_grade = channel_ct.T.groupby(level="grade_2024", observed=True).sum().T
+    channel_by_grade = channel_by_grade[[g for g in grades_order if g in channel_by_grade.columns]]
+
+    # 性別の正規化
+    if "性別" in df_eff.columns:
+        df_eff["gender_norm"] = gender_norm_series(df_eff["性別"])
+    else:
+        df_eff["gender_norm"] = pd.Categorical(["未回答・その他"] * len(df_eff), dtype=GENDER_DTYPE)
+
+    df_eff["school_level"] = school_level_series(df_eff["grade_2024"])
+
+    # 集計（未就学児を除いた有効データに対して）
+    n_total = len(df_eff)
 
-a4_css = f"""
+    # 性別
+    gender_counts = category_counts(df_eff["gender_norm"])
+    male = int(gender_counts.get("男性", 0))
+    female = int(gender_counts.get("女性", 0))
+    other = int(gender_counts.get("未回答・その他", 0))
+
+    # 学校区分
+    level_counts = category_counts(df_eff["school_level"])
+    prim = int(level_counts.get("小学校", 0))
+    mid = int(level_counts.get("中学校", 0))
+    unknown_lv = int(level_counts.get("不明", 0))
+
+    # HTML生成
+    now_str = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+    a4_css = f"""
   @page {{ size: A4 portrait; }}  /* 余白はChromeデフォルトを使うためmargin指定はしない */
   /* html, body の固定高さは印刷でオーバーフローを誘発するため外す */
   html, body {{ /* height: 100%; 削除 */ }}
@@ -507,45 +762,53 @@ a4_css = f"""
   .legend2 .swatch {{ width: 10px; height: 10px; border-radius: 2px; display: inline-block; border: 1px solid rgba(0,0,0,0.05); }}
 """
 
-male_pct = pct(male, n_total)
-female_pct = pct(female, n_total)
-other_pct = pct(other, n_total)
-
-prim_pct = pct(prim, n_total)
-mid_pct = pct(mid, n_total)
-unknown_lv_pct = pct(unknown_lv, n_total)
-
-# 男女 × 学校区分（小学校/中学校）クロス集計（未就学児除外データで）
-rows_order = ["男性", "女性"]
-cols_order = ["小学校", "中学校"]
-ct = pd.crosstab(df_eff["gender_norm"], df_eff["school_level"])
-ct = ct.reindex(index=rows_order, columns=cols_order, fill_value=0)
-# 合計
-row_totals = ct.sum(axis=1)
-col_totals = ct.sum(axis=0)
-grand_total = int(ct.values.sum())
-
-# 各行の割合（総数に対する％）
-row_pct = row_totals.apply(lambda n: pct(int(n), grand_total)) if grand_total else row_totals.apply(lambda n: 0)
-
-# 地域別 × 学校区分（小学校/中学校）クロス集計
-region_rows_order = ["東京23区", "三多摩島しょ", "埼玉県", "神奈川県", "千葉県", "その他"]
-region_ct = pd.crosstab(df_eff["region_bucket"], df_eff["school_level"])
-region_ct = region_ct.reindex(index=region_rows_order, columns=cols_order, fill_value=0)
-region_row_totals = region_ct.sum(axis=1)
-region_col_totals = region_ct.sum(axis=0)
-# 行割合（総数に対する％）
-region_row_pct = region_row_totals.apply(lambda n: pct(int(n), grand_total)) if grand_total else region_row_totals.apply(lambda n: 0)
+    male_pct = pct(male, n_total)
+    female_pct = pct(female, n_total)
+    other_pct = pct(other, n_total)
+
+    prim_pct = pct(prim, n_total)
+    mid_pct = pct(mid, n_total)
+    unknown_lv_pct = pct(unknown_lv, n_total)
+
+    # 男女 × 学校区分（小学校/中学校）クロス集計（未就学児除外データで）
+    rows_order = ["男性", "女性"]
+    cols_order = ["小学校", "中学校"]
+    # 性別・地域・学校区分の組み合わせを1回だけ数え、男女×学校区分と地域×学校区分はその周辺和から求める
+    demographic_counts = df_eff.groupby(DEMOGRAPHIC_KEYS, observed=True).size()
+    ct = marginal_table(demographic_counts, "gender_norm", "school_level")
+    ct = ct.reindex(index=rows_order, columns=cols_order, fill_value=0)
+    # 合計
+    row_totals = ct.sum(axis=1)
+    col_totals = ct.sum(axis=0)
+    grand_total = int(ct.values.sum())
+
+    # 各行の割合（総数に対する％）
+    row_pct = row_totals.apply(lambda n: pct(int(n), grand_total)) if grand_total else row_totals.apply(lambda n: 0)
+
+    # 地域別 × 学校区分（小学校/中学校）クロス集計
+    region_rows_order = ["東京23区", "三多摩島しょ", "埼玉県", "神奈川県", "千葉県", "その他"]
+    region_ct = marginal_table(demographic_counts, "region_bucket", "school_level")
+    region_ct = region_ct.reindex(index=region_rows_order, columns=cols_order, fill_value=0)
+    region_row_totals = region_ct.sum(axis=1)
+    region_col_totals = region_ct.sum(axis=0)
+    # 行割合（総数に対する％）
+    region_row_pct = region_row_totals.apply(lambda n: pct(int(n), grand_total)) if grand_total else region_row_totals.apply(lambda n: 0)
+
+    region_rows_html = render_region_rows(region_ct, region_row_totals, region_row_pct, region_rows_order)
+    return {name: value for name, value in locals().items() if not name.startswith("_")}
+
+_module_summary: Optional[Dict[str, object]] = None
+
+def __getattr__(name: str):
+    global _module_summary
+    if not name.startswith("_"):
+        if _module_summary is None:
+            _module_summary = build_module_summary()
+            globals().update(_module_summary)
+        if name in _module_summary:
+            return _module_summary[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 数値のフォーマット
-def fmt_int(n: int) -> str:
-    return f"{int(n):,}"
-
-# 地域別HTML行生成
-region_rows_html = "\n".join([
-    f"          <tr>\n            <td class=\"label\">{label}</td>\n            <td>{fmt_int(region_ct.loc[label, '小学校'])}</td>\n            <td>{fmt_int(region_ct.loc[label, '中学校'])}</td>\n            <td>{fmt_int(region_row_totals.loc[label])}</td>\n            <td>{region_row_pct.loc[label]}%</td>\n          </tr>"
-    for label in region_rows_order
-])
 
 # Phase 3: 設定クラス（HTMLComponentsより前に定義する必要がある）
 @dataclass
@@ -570,6 +833,96 @@ class ComponentConfig:
     # パーセンテージ表示の閾値設定（この値より小さい場合は棒グラフの外側に表示）
     percent_threshold_external: float = 7.0
 
+def escape_html(s) -> str:
+    """最低限のエスケープ（選択肢や補足に <, >, & が含まれる場合に備える）"""
+    # 標準ライブラリの html.escape（引用符はエスケープしない）。& → < → > の順の置換と同じ結果
+    # （str.translate は日本語などの非ASCII文字列では1文字ずつの辞書引きになり、かえって遅い）
+    return _escape_text(str(s))
+
+# 選択肢名・区分名など同じ文字列が設問×区分の回数だけ繰り返しエスケープされるため、結果をキャッシュする
+@lru_cache(maxsize=4096)
+def _escape_text(text: str) -> str:
+    return html.escape(text, quote=False)
+
+# 選択肢テキストの自然な分割点（文字 → (優先順位, オフセット)。優先順位は小さいほど優先）
+# offset=1は文字の後で分割、offset=0は文字の前で分割
+OPTION_BREAK_CHARS = {
+    '（': (0, 1),   # 開き括弧の後で分割
+    '(': (1, 1),    # 英語開き括弧の後で分割
+    'を': (2, 1),   # 「を」の後で分割
+    'の': (3, 1),   # 「の」の後で分割
+    'に': (4, 1),   # 「に」の後で分割
+    'で': (5, 1),   # 「で」の後で分割
+    '・': (6, 1),   # 中点の後で分割
+    '、': (7, 1),   # 読点の後で分割（読点を前の行に含める）
+    '。': (8, 1),   # 句点の後で分割（句点を前の行に含める）
+    '，': (9, 1),   # カンマの後で分割（カンマを前の行に含める）
+    '；': (10, 1),  # セミコロンの後で分割（セミコロンを前の行に含める）
+}
+# 句読点系の分割は特別扱い（行頭に来るのを防ぐ）
+PUNCTUATION_BREAK_CHARS = frozenset(['、', '。', '，', '；'])
+
+@lru_cache(maxsize=4096)
+def split_long_option_html(text: str, max_length: int = 12) -> str:
+    """選択肢テキストを適切に改行分割したHTML（同じ選択肢は地域別・学年別で繰り返し描画されるためキャッシュする）"""
+    if len(text) <= max_length:
+        return escape_html(text)
+
+    # 最適な分割位置を探す（テキストの中央付近で自然な分割点を探す）
+    min_pos = max(3, max_length // 3)  # 最低3文字、理想的には1/3の位置以降
+
+    # 長いテキストの場合は制限を緩和
+    if len(text) > max_length * 1.5:
+        # 長いテキストの場合は、より柔軟な範囲を設定
+        max_pos = min(len(text) - 3, int(len(text) * 0.75))
+    else:
+        max_pos = min(len(text) - 3, max_length * 2 // 3)  # 最大で2/3の位置まで
+    punctuation_min_pos = max(3, min_pos - 2)
+    punctuation_max_pos = min(len(text) - 2, max_pos + 4)
+
+    target_pos = len(text) // 2  # 理想的な分割位置（中央）
+
+    # 全ての分割候補を1回の走査で収集（同点時は 優先順位 → 出現位置 の順）
+    best = None
+    for pos, break_char in enumerate(text):
+        brk = OPTION_BREAK_CHARS.get(break_char)
+        if brk is None:
+            continue
+        priority, offset = brk
+        split_pos = pos + offset
+
+        # 句読点系の場合は範囲を拡張
+        if break_char in PUNCTUATION_BREAK_CHARS:
+            in_range = punctuation_min_pos <= split_pos <= punctuation_max_pos
+        else:
+            in_range = min_pos <= split_pos <= max_pos
+        if not (in_range and 0 < split_pos < len(text)):
+            continue
+
+        distance = abs(split_pos - target_pos)
+        # スコア計算（低いほど良い）
+        if break_char in PUNCTUATION_BREAK_CHARS:
+            # 句読点は優先度を大幅に上げる
+            score = distance * 0.3 + priority * 0.1
+        elif break_char == '・':
+            # 中点も優先度を上げる（パンフレット等の区切りに最適）
+            score = distance * 0.6 + priority * 0.1
+        elif break_char in ('（', '('):
+            # 括弧も比較的優先
+            score = distance * 0.7 + priority * 0.1
+        else:
+            # その他の助詞等
+            score = distance * 1.0 + priority * 0.2
+
+        candidate = (score, priority, pos, split_pos)
+        if best is None or candidate < best:
+            best = candidate
+
+    # 最適な分割点を選択（スコアが最も低いもの）。見つからない場合は中央付近で分割
+    best_split = best[3] if best is not None else min(max_length, len(text) // 2)
+
+    return f"{escape_html(text[:best_split])}<br>{escape_html(text[best_split:])}"
+
 # HTMLComponents基底クラス（Phase 1: 基底コンポーネント作成）
 class HTMLComponents:
     def __init__(self, styles: str = "", config: Optional[ComponentConfig] = None):
@@ -584,125 +937,36 @@ class HTMLComponents:
 
     def escape_html(self, s: str) -> str:
         """最低限のエスケープ（選択肢や補足に <, >, & が含まれる場合に備える）"""
-        return (
-            str(s)
-            .replace("&", "&amp;")
-            .replace("<", "&lt;")
-            .replace(">", "&gt;")
-        )
+        return escape_html(s)
     
     def split_long_option_text(self, text: str, max_length: int = 12) -> str:
         """選択肢テキストを適切に改行分割"""
-        if len(text) <= max_length:
-            return self.escape_html(text)
-        
-        # 自然な分割点を探す（優先順位順）
-        # offset=1は文字の後で分割、offset=0は文字の前で分割
-        natural_breaks = [
-            ('（', 1),   # 開き括弧の後で分割
-            ('(', 1),    # 英語開き括弧の後で分割
-            ('を', 1),   # 「を」の後で分割
-            ('の', 1),   # 「の」の後で分割
-            ('に', 1),   # 「に」の後で分割
-            ('で', 1),   # 「で」の後で分割
-            ('・', 1),   # 中点の後で分割
-            ('、', 1),   # 読点の後で分割（読点を前の行に含める）
-            ('。', 1),   # 句点の後で分割（句点を前の行に含める）
-            ('，', 1),   # カンマの後で分割（カンマを前の行に含める）
-            ('；', 1),   # セミコロンの後で分割（セミコロンを前の行に含める）
-        ]
-        
-        # 最適な分割位置を探す（テキストの中央付近で自然な分割点を探す）
-        min_pos = max(3, max_length // 3)  # 最低3文字、理想的には1/3の位置以降
-        
-        # 長いテキストの場合は制限を緩和
-        if len(text) > max_length * 1.5:
-            # 長いテキストの場合は、より柔軟な範囲を設定
-            max_pos = min(len(text) - 3, int(len(text) * 0.75))
-        else:
-            max_pos = min(len(text) - 3, max_length * 2 // 3)  # 最大で2/3の位置まで
-        
-        best_split = None
-        best_distance = float('inf')
-        target_pos = len(text) // 2  # 理想的な分割位置（中央）
-        
-        # 句読点系の分割は特別扱い（行頭に来るのを防ぐ）
-        punctuation_chars = ['、', '。', '，', '；']
-        
-        # 全ての分割候補を収集
-        split_candidates = []
-        
-        for priority, (break_char, offset) in enumerate(natural_breaks):
-            pos = text.find(break_char)
-            while pos != -1:
-                split_pos = pos + offset
-                
-                # 句読点系の場合は範囲を拡張
-                if break_char in punctuation_chars:
-                    punctuation_min_pos = max(3, min_pos - 2)
-                    punctuation_max_pos = min(len(text) - 2, max_pos + 4)
-                    in_range = punctuation_min_pos <= split_pos <= punctuation_max_pos
-                else:
-                    in_range = min_pos <= split_pos <= max_pos
-                
-                if in_range and 0 < split_pos < len(text):
-                    distance = abs(split_pos - target_pos)
-                    
-                    # スコア計算（低いほど良い）
-                    if break_char in punctuation_chars:
-                        # 句読点は優先度を大幅に上げる
-                        score = distance * 0.3 + priority * 0.1
-                    elif break_char == '・':
-                        # 中点も優先度を上げる（パンフレット等の区切りに最適）
-                        score = distance * 0.6 + priority * 0.1
-                    elif break_char in ['（', '(']:
-                        # 括弧も比較的優先
-                        score = distance * 0.7 + priority * 0.1
-                    else:
-                        # その他の助詞等
-                        score = distance * 1.0 + priority * 0.2
-                    
-                    split_candidates.append((score, split_pos, break_char, pos))
-                
-                pos = text.find(break_char, pos + 1)
-        
-        # 最適な分割点を選択（スコアが最も低いもの）
-        if split_candidates:
-            split_candidates.sort(key=lambda x: x[0])  # スコアでソート
-            best_split = split_candidates[0][1]
-        
-        # 自然な分割点が見つからない場合、中央付近で分割
-        if best_split is None:
-            best_split = min(max_length, len(text) // 2)
-        
-        part1 = text[:best_split]
-        part2 = text[best_split:]
-        
-        return f"{self.escape_html(part1)}<br>{self.escape_html(part2)}"
+        return split_long_option_html(text, max_length)
 
     def render_stacked_bar(self, title: str, counts: dict, order: list[str], colors: dict, unit: str, show_total_right: bool = True, show_labels: bool = True) -> str:
         """1本の積み上げ棒HTMLを生成"""
         S = sum(counts.values())
         if S == 0:
             return ""
+        # order 順に揃えた回答数（以降は位置で参照する）
+        order_counts = counts_to_array(counts, order).tolist()
         
         # 1. 実際の割合を計算
         actual_widths = {}
-        for o in order:
-            c = counts.get(o, 0)
+        for o, c in zip(order, order_counts):
             if c > 0:
                 actual_widths[o] = (c / S) * 100.0
         
         # 2. 外側ラベル対象を判定（ラベル非表示時は空）
-        outside_labels = []
+        outside_labels = []  # [(order内の位置, 選択肢)]
         inside_segments = []
         
-        for o in order:
+        for j, o in enumerate(order):
             if o not in actual_widths:
                 continue
             actual_w = actual_widths[o]
             if show_labels and (actual_w < self.outside_label_threshold_pct):
-                outside_labels.append(o)
+                outside_labels.append((j, o))
             else:
                 inside_segments.append(o)
         
@@ -734,7 +998,7 @@ class HTMLComponents:
             
             # 1) 各外側ラベルの基本情報（中心位置と表示テキスト）を集める
             label_data = []
-            for o in outside_labels:
+            for j, o in outside_labels:
                 # セグメント中央位置を計算
                 left_pos = 0.0
                 for prev_o in order:
@@ -745,8 +1009,8 @@ class HTMLComponents:
                 center_pos = left_pos + (adjusted_widths.get(o, 0) / 2)
                 
                 # 表示テキストは常に「回答数（％）」にする
-                c = counts.get(o, 0)
-                label_pct = round((c / S) * 100.0, 1)
+                c = order_counts[j]
+                label_pct = pct_str(c, S)
                 label_text = f"{fmt_int(c)} ({label_pct}%)"
                 
                 label_data.append((center_pos, label_text, o))
@@ -758,12 +1022,11 @@ class HTMLComponents:
             def render_single_bottom_layer(labels):
                 if not labels:
                     return ""
-                layer_html = '<div class="label-layer-1">'
-                for pos, text, option in labels:
-                    label_style = f"left:{pos:.2f}%; transform:translateX(-50%);"
-                    layer_html += f'<div class="outside-label" style="{label_style}">{text}</div>'
-                layer_html += '</div>'
-                return layer_html
+                label_divs = "".join(
+                    f'<div class="outside-label" style="left:{pos:.2f}%; transform:translateX(-50%);">{text}</div>'
+                    for pos, text, option in labels
+                )
+                return f'<div class="label-layer-1">{label_divs}</div>'
             
             bottom_html = render_single_bottom_layer(adjusted_label_data)
             top_container = ""  # 上側ラベルは表示しない
@@ -773,30 +1036,24 @@ class HTMLComponents:
         top_labels_html, bottom_labels_html = calculate_outside_labels_html()
         
         # 6. セグメントHTML生成（内側ラベルのみ）
+        # 選択肢名のエスケープ・色・「回答数（％）」はセグメントごとに1回だけ求め、3通りの出力で共用する
         left = 0.0
         segs = []
-        for o in order:
+        colors_get = colors.get
+        for j, o in enumerate(order):
             if o not in adjusted_widths:
                 continue
             
-            c = counts.get(o, 0)
+            c = order_counts[j]
             w = adjusted_widths[o]
-            label_pct = round((c / S) * 100.0, 1)
+            count_text = f"{fmt_int(c)} ({pct_str(c, S)}%)"
             
-            style = f"left:{left:.6f}%;width:{w:.6f}%;background:{colors.get(o,'#999')};"
+            style = f"left:{left:.6f}%;width:{w:.6f}%;background:{colors_get(o, '#999')};"
             
-            if show_labels:
-                # 内側ラベル表示判定
-                if o in inside_segments:
-                    # 内側セグメント: 回答数（％）を表示
-                    segs.append(f"<div class=\"seg\" style=\"{style}\" title=\"{self.escape_html(o)} {fmt_int(c)} ({label_pct}%)\"><span class=\"seg-label\">{fmt_int(c)} ({label_pct}%)</span></div>")
-                else:
-                    # 外側ラベル対象（OUTSIDE_LABEL_THRESHOLD_PCT判定）
-                    # 棒内部には一切の数値等を表示しない（タイトルのみ）
-                    segs.append(f"<div class=\"seg\" style=\"{style}\" title=\"{self.escape_html(o)} {fmt_int(c)} ({label_pct}%)\"></div>")
-            else:
-                # ラベルを一切表示しない（内外ともに）
-                segs.append(f"<div class=\"seg\" style=\"{style}\" title=\"{self.escape_html(o)} {fmt_int(c)} ({label_pct}%)\"></div>")
+            # 内側セグメントのみ回答数（％）を棒の中に表示する
+            # 外側ラベル対象（OUTSIDE_LABEL_THRESHOLD_PCT判定）と、ラベル非表示の場合はタイトルのみ
+            inner = f'<span class="seg-label">{count_text}</span>' if show_labels and o in inside_segments else ""
+            segs.append(f'<div class="seg" style="{style}" title="{escape_html(o)} {count_text}">{inner}</div>')
             
             left += w
         
@@ -820,23 +1077,20 @@ class HTMLComponents:
             else:
                 return f'<div class="bar-row"><div class="stacked-bar">{"".join(segs)}</div></div>'
 
-    def render_group_bars(self, group_label: str, frames: list, qcol: str, order: list, colors: dict, unit: str) -> str:
-        """グループごとの棒群HTML（見出し＋棒複数 or データなし）"""
-        bars = []
-        for name, fr in frames:
-            counts, S = aggregate_group(fr, qcol, order)
-            if S > 0:
-                bars.append(f"<div><div class=\"q-subheading\">{self.escape_html(name)}</div>{self.render_stacked_bar(name, counts, order, colors, unit, show_total_right=True, show_labels=False)}</div>")
-        if not bars:
+    def render_group_bars(self, group_label: str, frames: list, qcol: str, order: list, colors: dict, unit: str,
+                          aggregated: Optional[list] = None) -> str:
+        """グループごとの棒群HTML（見出し＋棒複数 or データなし。aggregated は aggregate_frames の結果）"""
+        # 各グループの集計は1回だけ行い（呼び出し元で集計済みならそれを使う）、回答のあるグループだけを残す
+        if aggregated is None:
+            aggregated = aggregate_frames(frames, qcol, order)
+        aggregated = [(name, counts, S) for name, counts, S in aggregated if S > 0]
+        if not aggregated:
             return f"<div class=\"q-subheading\">{self.escape_html(group_label)}</div><div class=\"muted\">データなし</div>"
         # group_label as a heading, then stacked bars listed vertically
         inner = []
         # 単位から表示サフィックス（人/回）を決定
         suffix = "回" if unit.endswith("回中") else "人"
-        for name, fr in frames:
-            counts, S = aggregate_group(fr, qcol, order)
-            if S == 0:
-                continue
+        for name, counts, S in aggregated:
             bar_html = self.render_stacked_bar(name, counts, order, colors, unit, show_total_right=False, show_labels=True)
             label_text = f"{self.escape_html(name)} = {S:,}{suffix}"
             inner.append(f"<div><div class=\"muted\" style=\"margin-bottom:0.3mm;\">{label_text}</div>{bar_html}</div>")
@@ -850,108 +1104,109 @@ class HTMLComponents:
             items.append(f"<span class=\"item\"><span class=\"swatch\" style=\"background:{colors.get(o,'#999')}\"></span>{self.escape_html(o)}</span>")
         return f"<div class=\"legend2\">{''.join(items)}</div>"
 
-    def render_option_count_table(self, sub_label: str, header_label: str, frames: list[tuple[str, pd.DataFrame]], qcol: str, options: list[str], df_eff_param: pd.DataFrame, n_total_param: int) -> str:
-        """指定したフレーム群に対して、選択肢ごとのカウント表を生成"""
+    def render_option_count_table(self, sub_label: str, header_label: str, frames: list[tuple[str, pd.DataFrame]], qcol: str, options: list[str], df_eff_param: pd.DataFrame, n_total_param: int,
+                                  aggregated: Optional[list] = None) -> str:
+        """指定したフレーム群に対して、選択肢ごとのカウント表を生成（aggregated は aggregate_frames の結果）"""
         # 列ヘッダー（転置版）: 選択肢 | 全体 | 各カテゴリ名
         col_headers = ["選択肢", "全体"] + [self.escape_html(name) for name, _ in frames]
         thead = "<thead><tr>" + "".join([f"<th>{h}</th>" for h in col_headers]) + "</tr></thead>"
 
-        # 全体のフレーム（全カテゴリ結合）
-        all_frame = pd.concat([fr for _, fr in frames], axis=0) if frames else df_eff_param
-        overall_counts, _S_overall = aggregate_group(all_frame, qcol, options)
+        # 各カテゴリの集計を事前計算（options 順の配列）
+        if aggregated is None:
+            aggregated = aggregate_frames(frames, qcol, options)
+        per_frame_counts = [  # [(name, counts_arr, denom)]
+            (name, counts_to_array(counts, options), len(fr))
+            for (name, counts, _S), (_name, fr) in zip(aggregated, frames)
+        ]
+
+        # 全体（全カテゴリ結合）の件数: 集計は行ごとの足し合わせのため、フレームを結合せず各カテゴリの件数の和で求める
+        if per_frame_counts:
+            overall_arr = np.sum([counts_arr for _name, counts_arr, _denom in per_frame_counts], axis=0)
+        else:
+            overall_arr = counts_to_array(aggregate_group(df_eff_param, qcol, options)[0], options)
         # 分母（回答者数）: 設問によらず、全体は n_total、各カテゴリは len(fr)
         overall_denom = n_total_param
 
-        # 各カテゴリの集計を事前計算
-        per_frame_counts = []  # [(name, counts_dict, denom)]
-        for name, fr in frames:
-            counts, _S = aggregate_group(fr, qcol, options)
-            denom = len(fr)
-            per_frame_counts.append((name, counts, denom))
+        # 選択肢 × 列（全体、各カテゴリ）の件数行列と列ごとの分母から、件数・割合の表示文字列をまとめて作る
+        # （全体の分母は回答者数、各カテゴリの分母はそのカテゴリの回答者数）
+        counts_matrix = np.column_stack([overall_arr] + [counts_arr for _name, counts_arr, _denom in per_frame_counts])
+        denoms = np.array([overall_denom] + [denom for _name, _counts_arr, denom in per_frame_counts], dtype=np.int64)
+        count_texts = fmt_int_rows(counts_matrix)
+        pct_texts = [[format_tenths(t) for t in row] for row in pct_tenths(counts_matrix, denoms).tolist()]
 
-        # 行: 各選択肢
+        # 行: 各選択肢（全体列と各カテゴリ列は同じ書式のセル）
         body_rows = []
-        for o in options:
-            tds = [f"<td class=\"label\">{self.escape_html(o)}</td>"]
-            # 全体（分母: 回答者数）
-            ov_num = overall_counts.get(o, 0)
-            ov_pct = 0 if overall_denom == 0 else round(ov_num * 100.0 / overall_denom, 1)
-            tds.append(f"<td>{fmt_int(ov_num)}<div class=\"muted\" style=\"font-size:8pt;\">{ov_pct}%</div></td>")
-            # 各カテゴリ（分母: そのカテゴリの回答者数）
-            for name, counts, denom in per_frame_counts:
-                num = counts.get(o, 0)
-                pct_val = 0 if denom == 0 else round(num * 100.0 / denom, 1)
-                tds.append(f"<td>{fmt_int(num)}<div class=\"muted\" style=\"font-size:8pt;\">{pct_val}%</div></td>")
-            body_rows.append("<tr>" + "".join(tds) + "</tr>")
+        for o, count_row, pct_row in zip(options, count_texts, pct_texts):
+            cells = "".join(
+                f"<td>{c}<div class=\"muted\" style=\"font-size:8pt;\">{p}%</div></td>" for c, p in zip(count_row, pct_row)
+            )
+            body_rows.append(f"<tr><td class=\"label\">{self.escape_html(o)}</td>{cells}</tr>")
 
         tbody = "<tbody>" + "".join(body_rows) + "</tbody>"
 
         return f"<div class=\"q-subheading\">{self.escape_html(sub_label)}</div><table class=\"simple\">{thead}{tbody}</table>"
 
-    def render_option_category_pct_table(self, sub_label: str, frames: list[tuple[str, pd.DataFrame]], qcol: str, options: list[str], colors: dict) -> str:
-        """選択肢ごと × 区分ごとの割合を横棒で示すテーブル（A/B/Cレイアウト風）"""
+    def render_option_category_pct_table(self, sub_label: str, frames: list[tuple[str, pd.DataFrame]], qcol: str, options: list[str], colors: dict,
+                                         aggregated: Optional[list] = None) -> str:
+        """選択肢ごと × 区分ごとの割合を横棒で示すテーブル（A/B/Cレイアウト風。aggregated は aggregate_frames の結果）"""
         if not frames or not options:
             return ""
 
         # ヘッダ（削除）
         thead = ""
 
-        # 事前計算（各区分の分母）
-        frame_denoms = [(name, len(fr)) for name, fr in frames]
-        # 各区分ごとの選択肢カウント
-        per_frame_counts = []  # (name, counts)
-        for name, fr in frames:
-            counts, _S = aggregate_group(fr, qcol, options)
-            per_frame_counts.append((name, counts))
+        # 事前計算（選択肢 × 区分のカウント行列と、各区分の分母）
+        if aggregated is None:
+            aggregated = aggregate_frames(frames, qcol, options)
+        counts_matrix = np.column_stack([counts_to_array(counts, options) for _name, counts, _S in aggregated])
+        denoms = np.array([len(fr) for _, fr in frames], dtype=np.int64)
+        # 割合（0.1%単位）は行列全体で一括計算し、ループ内では参照のみ
+        tenths_rows = pct_tenths(counts_matrix, denoms).tolist()
+        count_rows = counts_matrix.tolist()
+        denom_list = denoms.tolist()
 
-        # name -> (counts, denom) lookup
-        counts_map = {name: counts for name, counts in per_frame_counts}
-        denom_map = {name: denom for name, denom in frame_denoms}
+        # 区分名のセル（B列）は選択肢によらないため、区分ごとに1回だけ生成する
+        b_cells = [f"<td>{self.escape_html(name)}</td>" for name, _fr in frames]
+        external_threshold_tenths = self.config.percent_threshold_external * 10
 
         # 行生成
         body_rows = []
-        for o in options:
-            first = True
+        for j, o in enumerate(options):
+            # A列（選択肢名）は各選択肢の先頭行のみ（rowspan で区分の行数分を結合）
+            formatted_option = self.split_long_option_text(o, self.config.max_option_text_length)
+            a_cell = f"<td class=\"label option-text\" rowspan=\"{len(frames)}\">{formatted_option}</td>"
+            # C列（横棒）の色は選択肢ごとに固定
+            bar_color = colors.get(o, "#4c8bf5")
             # 表示対象の行数（全区分を表示。必要なら0件も表示）
-            for name, _ in frames:
-                denom = denom_map.get(name, 0)
-                num = counts_map.get(name, {}).get(o, 0)
-                pct_val = 0 if denom == 0 else round(num * 100.0 / denom, 1)
-                # A列
-                if first:
-                    formatted_option = self.split_long_option_text(o, self.config.max_option_text_length)
-                    a_cell = f"<td class=\"label option-text\" rowspan=\"{len(frames)}\">{formatted_option}</td>"
-                    first = False
-                else:
-                    a_cell = ""
-                # B列（区分名）
-                b_text = f"{self.escape_html(name)}"
-                b_cell = f"<td>{b_text}</td>"
-                # C列（横棒）
-                bar_color = colors.get(o, "#4c8bf5")
+            for k, b_cell in enumerate(b_cells):
+                denom = denom_list[k]
+                num = count_rows[j][k]
+                pct_tenth = tenths_rows[j][k]
+                pct_text = format_tenths(pct_tenth)
                 
                 # パーセンテージ表示位置を閾値で判定
-                if pct_val < self.config.percent_threshold_external:
+                if pct_tenth < external_threshold_tenths:
                     # 棒グラフの外側（右）に黒系色で表示
                     # 棒の終端位置を計算（幅 + 6pxのマージン）
-                    bar_end_position = f"{pct_val + 2}%"  # 棒の終端 + 2%のマージン
+                    bar_end_position = f"{format_tenths(pct_tenth + 20)}%"  # 棒の終端 + 2%のマージン
                     pct_display_in = ""
-                    pct_display_external = f"<span class=\"pct-external\" style=\"left:{bar_end_position};\">{pct_val}%</span>"
+                    pct_display_external = f"<span class=\"pct-external\" style=\"left:{bar_end_position};\">{pct_text}%</span>"
                 else:
                     # 棒グラフの中に白文字で表示
-                    pct_display_in = f"<span class=\"pct-in-bar\">{pct_val}%</span>"
+                    pct_display_in = f"<span class=\"pct-in-bar\">{pct_text}%</span>"
                     pct_display_external = ""
                 
                 c_cell = (
                     f"<td>"
                     f"  <div class=\"pct-bar\">"
-                    f"    <div class=\"pct-bar-fill\" style=\"width:{pct_val}%;background:{bar_color};\">{pct_display_in}</div>"
+                    f"    <div class=\"pct-bar-fill\" style=\"width:{pct_text}%;background:{bar_color};\">{pct_display_in}</div>"
                     f"    {pct_display_external}"
                     f"    <div class=\"pct-bar-right\">{num} / {denom} (人)</div>"
                     f"  </div>"
                     f"</td>"
                 )
-                body_rows.append("<tr>" + a_cell + b_cell + c_cell + "</tr>")
+                body_rows.append(f"<tr>{a_cell}{b_cell}{c_cell}</tr>")
+                a_cell = ""
 
         tbody = "<tbody>" + "".join(body_rows) + "</tbody>"
 
@@ -959,11 +1214,19 @@ class HTMLComponents:
 
 
 # Phase 2: 特化コンポーネント
+# 選択肢の記号（A..Z, AA..ZZ の 702 個）。これを超える場合のみ alpha_label で都度計算する
+ALPHA_LABELS = tuple(string.ascii_uppercase) + tuple(
+    a + b for a in string.ascii_uppercase for b in string.ascii_uppercase
+)
+
 class QuestionComponent(HTMLComponents):
     """設問専用コンポーネント"""
     
     def alpha_label(self, i: int) -> str:
         """A..Z, それ以降はAA, AB...（簡易実装）"""
+        # 2文字までは表引きで済ませる
+        if i < len(ALPHA_LABELS):
+            return ALPHA_LABELS[i]
         letters = []
         i0 = i
         while True:
@@ -1000,11 +1263,14 @@ class QuestionComponent(HTMLComponents):
     def render_question_analysis(self, q: str, opts: list, overall_counts: dict, S_overall: int, 
                                 order: list, colors: dict, unit: str, 
                                 region_frames: list, grade_frames: list,
-                                df_eff_param: pd.DataFrame, n_total_param: int) -> str:
-        """設問の分析部分（テーブル + グラフ + 凡例）を生成"""
-        
-        # 単一/複数の判定と説明文
-        multi = is_multiselect(df_eff_param, q)
+                                df_eff_param: pd.DataFrame, n_total_param: int,
+                                multi: Optional[bool] = None,
+                                region_agg: Optional[list] = None, grade_agg: Optional[list] = None) -> str:
+        """設問の分析部分（テーブル + グラフ + 凡例）を生成（region_agg / grade_agg は aggregate_frames の結果）"""
+        
+        # 単一/複数の判定と説明文（呼び出し元で判定済みならそれを使う）
+        if multi is None:
+            multi = is_multiselect(df_eff_param, q)
         if multi:
             explain_text = "以下のグラフの割合は、各区分の選択回数の合計を母数とし、合計は100%になります\n棒の右の数値は、その区分の合計回数です。"
         else:
@@ -1022,15 +1288,19 @@ class QuestionComponent(HTMLComponents):
         legend_html = self.render_legend(order, colors)
         explain_html = f"<div class=\"muted\" style=\"margin:2mm 0 2mm; white-space: pre-wrap;\">{self.escape_html(explain_text)}</div>"
         
-        # 地域別・学年別
-        region_html = self.render_group_bars("地域別", region_frames, q, order, colors, unit)
-        grade_html = self.render_group_bars("学年別", grade_frames, q, order, colors, unit)
+        # 地域別・学年別の集計は1回だけ行い（呼び出し元で集計済みならそれを使う）、棒グラフと各テーブルで共用する
+        if region_agg is None:
+            region_agg = aggregate_frames(region_frames, q, order)
+        if grade_agg is None:
+            grade_agg = aggregate_frames(grade_frames, q, order)
+        region_html = self.render_group_bars("地域別", region_frames, q, order, colors, unit, aggregated=region_agg)
+        grade_html = self.render_group_bars("学年別", grade_frames, q, order, colors, unit, aggregated=grade_agg)
         
         # テーブル
-        region_pct_table_html = self.render_option_category_pct_table("地域別（選択肢×地域の割合）", region_frames, q, order, colors)
-        grade_pct_table_html = self.render_option_category_pct_table("地域別（選択肢×学年の割合）", grade_frames, q, order, colors)
-        region_table_html = self.render_option_count_table("地域別", "地域", region_frames, q, order, df_eff_param, n_total_param)
-        grade_table_html = self.render_option_count_table("学年別", "学年", grade_frames, q, order, df_eff_param, n_total_param)
+        region_pct_table_html = self.render_option_category_pct_table("地域別（選択肢×地域の割合）", region_frames, q, order, colors, aggregated=region_agg)
+        grade_pct_table_html = self.render_option_category_pct_table("地域別（選択肢×学年の割合）", grade_frames, q, order, colors, aggregated=grade_agg)
+        region_table_html = self.render_option_count_table("地域別", "地域", region_frames, q, order, df_eff_param, n_total_param, aggregated=region_agg)
+        grade_table_html = self.render_option_count_table("学年別", "学年", grade_frames, q, order, df_eff_param, n_total_param, aggregated=grade_agg)
         
         return f"""
         {region_pct_table_html}
@@ -1045,15 +1315,20 @@ class QuestionComponent(HTMLComponents):
         {grade_html}
         """
     
-    def render_question_section(self, idx: int, q: str, df: pd.DataFrame, df_eff: pd.DataFrame, n_total: int) -> str:
-        """設問セクション全体を生成"""
+    def group_positions(self, df_eff: pd.DataFrame) -> Tuple[list, list]:
+        """地域別・学年別の [(区分名, 行位置の配列)]（設問によらないため、呼び出し元で1回求めて各設問に渡す）"""
+        def positions(col: str, labels: list) -> list:
+            values = df_eff[col]
+            return [(lab, np.flatnonzero(values.eq(lab).to_numpy(dtype=bool))) for lab in labels]
+        return positions("region_bucket", self.region_order), positions("grade_2024", self.grade_order)
+
+    def render_question_section(self, idx: int, q: str, df: pd.DataFrame, df_eff: pd.DataFrame, n_total: int,
+                                supplement: Optional[str] = None,
+                                group_positions: Optional[Tuple[list, list]] = None) -> str:
+        """設問セクション全体を生成（supplement 未指定時は補足説明列から取得。group_positions は self.group_positions(df_eff) の結果）"""
         # 補足説明列が存在すれば、最初の非空データを拾って表示
-        supp_col = f"補足説明{q}"
-        supplement = ""
-        if supp_col in df.columns:
-            first_val = first_non_empty_value(df[supp_col])
-            if first_val is not None:
-                supplement = first_val
+        if supplement is None:
+            supplement = supplement_texts(df, [q]).get(q, "")
         
         # 設問の選択肢（ユニーク）を取得
         opts = get_question_options(df, q)
@@ -1063,8 +1338,13 @@ class QuestionComponent(HTMLComponents):
             header_html = self.render_question_header(idx, q, supplement, opts)
             return f"""<section class="page-break">{header_html}<div class="muted">データなし</div></section>"""
         
-        # 集計：全体
-        overall_counts, S_overall = aggregate_group(df_eff, q, opts)
+        # 集計：全体・地域別・学年別（行位置は設問間で共用し、設問列の走査は1回にまとめる）
+        if group_positions is None:
+            group_positions = self.group_positions(df_eff)
+        region_positions, grade_positions = group_positions
+        overall_counts, S_overall, (region_agg, grade_agg) = aggregate_question(
+            df_eff[q], opts, [region_positions, grade_positions]
+        )
         # 並び順（全体割合降順。同率は辞書順。その他は最後）
         order = order_options_by_overall(overall_counts, S_overall)
         # 色割当（設問内で固定）
@@ -1074,14 +1354,18 @@ class QuestionComponent(HTMLComponents):
         multi = is_multiselect(df_eff, q)
         unit = "回中" if multi else "人中"
         
-        # 地域別・学年別フレーム
-        region_frames = [(lab, df_eff[df_eff["region_bucket"] == lab]) for lab in self.region_order]
-        grade_frames = [(lab, df_eff[df_eff["grade_2024"] == lab]) for lab in self.grade_order]
+        # 地域別・学年別フレーム（設問ごとにはこの設問の列だけを取り出す）と、並び順に揃えた集計
+        answers = df_eff[[q]]
+        region_frames = [(lab, answers.take(pos)) for lab, pos in region_positions]
+        grade_frames = [(lab, answers.take(pos)) for lab, pos in grade_positions]
+        region_agg = [(name, {o: counts[o] for o in order}, S) for name, counts, S in region_agg]
+        grade_agg = [(name, {o: counts[o] for o in order}, S) for name, counts, S in grade_agg]
         
         # ヘッダーと分析部分を組み合わせ
         header_html = self.render_question_header(idx, q, supplement, opts)
         analysis_html = self.render_question_analysis(q, opts, overall_counts, S_overall, order, colors, unit, 
-                                                    region_frames, grade_frames, df_eff, n_total)
+                                                    region_frames, grade_frames, df_eff, n_total, multi=multi,
+                                                    region_agg=region_agg, grade_agg=grade_agg)
         
         return f"""<section class="page-break">{header_html}{analysis_html}</section>"""
 
@@ -1118,6 +1402,14 @@ class DemographicsComponent(HTMLComponents):
     def render_gender_table(self, ct: pd.DataFrame, row_totals: pd.Series, row_pct: pd.Series, 
                            col_totals: pd.Series, grand_total: int) -> str:
         """男女別テーブルを生成"""
+        # 表中の整数（男女×学校区分、行合計、列合計・総計）はまとめて桁区切り文字列にする
+        body = np.column_stack([
+            ct.reindex(index=["男性", "女性"], columns=["小学校", "中学校"]).to_numpy(),
+            row_totals.reindex(["男性", "女性"]).to_numpy(),
+        ])
+        foot = np.append(col_totals.reindex(["小学校", "中学校"]).to_numpy(), grand_total)
+        (male_prim, male_mid, male_total), (female_prim, female_mid, female_total), (prim_total, mid_total, grand_total_s) = fmt_int_rows(np.vstack([body, foot]))
+        male_pct, female_pct = row_pct.reindex(["男性", "女性"]).tolist()
         return f"""
         <h3>男女別</h3>
         <table class="simple">
@@ -1133,25 +1425,25 @@ class DemographicsComponent(HTMLComponents):
             <tbody>
                 <tr>
                     <td class="label">男性</td>
-                    <td>{fmt_int(ct.loc['男性','小学校'])}</td>
-                    <td>{fmt_int(ct.loc['男性','中学校'])}</td>
-                    <td>{fmt_int(row_totals.loc['男性'])}</td>
-                    <td>{row_pct.loc['男性']}%</td>
+                    <td>{male_prim}</td>
+                    <td>{male_mid}</td>
+                    <td>{male_total}</td>
+                    <td>{male_pct}%</td>
                 </tr>
                 <tr>
                     <td class="label">女性</td>
-                    <td>{fmt_int(ct.loc['女性','小学校'])}</td>
-                    <td>{fmt_int(ct.loc['女性','中学校'])}</td>
-                    <td>{fmt_int(row_totals.loc['女性'])}</td>
-                    <td>{row_pct.loc['女性']}%</td>
+                    <td>{female_prim}</td>
+                    <td>{female_mid}</td>
+                    <td>{female_total}</td>
+                    <td>{female_pct}%</td>
                 </tr>
             </tbody>
             <tfoot>
                 <tr>
                     <td class="label">合計</td>
-                    <td>{fmt_int(col_totals.loc['小学校'])}</td>
-                    <td>{fmt_int(col_totals.loc['中学校'])}</td>
-                    <td>{fmt_int(grand_total)}</td>
+                    <td>{prim_total}</td>
+                    <td>{mid_total}</td>
+                    <td>{grand_total_s}</td>
                     <td>100%</td>
                 </tr>
             </tfoot>
@@ -1161,10 +1453,7 @@ class DemographicsComponent(HTMLComponents):
     def render_region_table(self, region_ct: pd.DataFrame, region_row_totals: pd.Series, region_row_pct: pd.Series, 
                            region_col_totals: pd.Series, grand_total: int) -> str:
         """地域別テーブルを生成"""
-        region_rows_html = "\n".join([
-            f"          <tr>\n            <td class=\"label\">{label}</td>\n            <td>{fmt_int(region_ct.loc[label, '小学校'])}</td>\n            <td>{fmt_int(region_ct.loc[label, '中学校'])}</td>\n            <td>{fmt_int(region_row_totals.loc[label])}</td>\n            <td>{region_row_pct.loc[label]}%</td>\n          </tr>"
-            for label in self.region_order
-        ])
+        region_rows_html = render_region_rows(region_ct, region_row_totals, region_row_pct, self.region_order)
         
         return f"""
         <h3>地域別</h3>
@@ -1218,6 +1507,8 @@ class ReportConfig:
     venue: str = "サンプル会場 A"
     event_dates: str = "9月1日（日）"
     fiscal_year: int = field(default_factory=lambda: int(os.getenv("FISCAL_YEAR", "2024")))
+    # 設問セクション生成の並列プロセス数（1なら逐次処理、0ならCPU数）
+    max_workers: int = field(default_factory=lambda: int(os.getenv("REPORT_MAX_WORKERS", "1")) or os.cpu_count() or 1)
     
     @classmethod
     def from_env(cls) -> 'ReportConfig':
@@ -1260,7 +1551,7 @@ class ReportDataPreparator:
         """Excelファイルからレポート用データを準備"""
         # 1) 読み込み
         try:
-            df = pd.read_excel(excel_path, engine="openpyxl")
+            df = read_survey_excel(Path(excel_path))
         except FileNotFoundError:
             raise FileNotFoundError(f"Excelファイルが見つかりません: {excel_path}")
         except Exception as e:
@@ -1285,12 +1576,15 @@ class ReportDataPreparator:
         df = self.clean_string_data(df)
         
         # 4) 生年月日を日時化
-        df["birth_dt"] = df["生年月日"].apply(self.parse_birth)
-        
-        # 5) 2024年度の「4/1時点学年」を算出
+        # 5) 2024年度の「4/1時点学年」を算出（生年月日・学年・年齢は1回の assign でまとめて追加）
         april1 = pd.Timestamp(f"{self.config.fiscal_year}-04-01")
-        df["grade_2024"] = df["birth_dt"].apply(lambda d: self.grade_ja_on_april1(d, april1))
-        df["age_2024"] = df["birth_dt"].apply(lambda d: self.age_on(d, april1))
+        birth_dt = parse_birth_series(df["生年月日"])
+        age = age_on_series(birth_dt, april1)
+        df = df.assign(
+            birth_dt=birth_dt,
+            grade_2024=grade_from_age_series(age),
+            age_2024=age,
+        )
         
         # 6) 未就学児除外
         preschool_mask = (
@@ -1299,35 +1593,30 @@ class ReportDataPreparator:
             | (df["grade_2024"] == "対象外")
         )
         n_preschool = int(preschool_mask.sum())
-        df_eff = df.loc[~preschool_mask].copy()
+        question_columns = get_question_columns(df)
+        df_eff = df.loc[~preschool_mask, effective_column_mask(df, question_columns)]
         
         # 7) 地域区分
-        df_eff["region_bucket"] = [self.region_bucket(p, c) for p, c in zip(df_eff.get("都道府県"), df_eff.get("市区町村"))]
-        
-        # 8) 複数回答の縦持ち化
-        col_channel = "本イベントを何でお知りになりましたか？（複数回答可）"
-        col_learning = "現在習い事や塾などに通われていますか？（複数回答可）"
-        if col_channel in df_eff.columns:
-            df_eff["channel_list"] = self.split_multiselect(df_eff[col_channel])
-        if col_learning in df_eff.columns:
-            df_eff["learning_list"] = self.split_multiselect(df_eff[col_learning])
+        df_eff["region_bucket"] = region_bucket_series(df_eff["都道府県"], df_eff["市区町村"])
         
-        # 9) 性別正規化
+        # 8) 性別正規化
         if "性別" in df_eff.columns:
-            df_eff["gender_norm"] = df_eff["性別"].apply(self.normalize_gender)
+            df_eff["gender_norm"] = gender_norm_series(df_eff["性別"])
         else:
-            df_eff["gender_norm"] = "未回答・その他"
+            df_eff["gender_norm"] = pd.Categorical(["未回答・その他"] * len(df_eff), dtype=GENDER_DTYPE)
             
-        # 10) 学校区分
-        df_eff["school_level"] = df_eff["grade_2024"].apply(self.school_level_from_grade)
+        # 9) 学校区分
+        df_eff["school_level"] = school_level_series(df_eff["grade_2024"])
         
-        # 11) クロス集計データ準備
+        # 10) クロス集計データ準備
         n_total = len(df_eff)
         
         # 男女 × 学校区分
         rows_order = ["男性", "女性"]
         cols_order = ["小学校", "中学校"]
-        ct = pd.crosstab(df_eff["gender_norm"], df_eff["school_level"])
+        # 性別・地域・学校区分の組み合わせを1回だけ数え、2つのクロス集計表は周辺和から求める
+        demographic_counts = df_eff.groupby(DEMOGRAPHIC_KEYS, observed=True).size()
+        ct = marginal_table(demographic_counts, "gender_norm", "school_level")
         ct = ct.reindex(index=rows_order, columns=cols_order, fill_value=0)
         row_totals = ct.sum(axis=1)
         col_totals = ct.sum(axis=0)
@@ -1336,15 +1625,12 @@ class ReportDataPreparator:
         
         # 地域別 × 学校区分
         region_rows_order = ["東京23区", "三多摩島しょ", "埼玉県", "神奈川県", "千葉県", "その他"]
-        region_ct = pd.crosstab(df_eff["region_bucket"], df_eff["school_level"])
+        region_ct = marginal_table(demographic_counts, "region_bucket", "school_level")
         region_ct = region_ct.reindex(index=region_rows_order, columns=cols_order, fill_value=0)
         region_row_totals = region_ct.sum(axis=1)
         region_col_totals = region_ct.sum(axis=0)
         region_row_pct = region_row_totals.apply(lambda n: self.pct(int(n), grand_total)) if grand_total else region_row_totals.apply(lambda n: 0)
         
-        # 12) 設問一覧取得
-        question_columns = get_question_columns(df)
-        
         return ProcessedData(
             df_original=df,
             df_effective=df_eff,
@@ -1364,17 +1650,7 @@ class ReportDataPreparator:
     
     # 既存のヘルパーメソッドを移植
     def map_answer_columns(self, frame: pd.DataFrame) -> pd.DataFrame:
-        cols = list(frame.columns)
-        new_names = list(cols)
-        for i, c in enumerate(cols):
-            if c == "回答" or re.match(r"^回答\.\d+$", str(c)):
-                if i == 0:
-                    continue
-                original_left = cols[i - 1]
-                new_names[i - 1] = f"補足説明{original_left}"
-                new_names[i] = original_left
-        rename_map = {old: new for old, new in zip(cols, new_names) if old != new}
-        return frame.rename(columns=rename_map)
+        return map_answer_columns(frame)
     
     def aggregate_ranking_questions(self, frame: pd.DataFrame) -> pd.DataFrame:
         """ランキング質問の集約処理"""
@@ -1417,19 +1693,14 @@ class ReportDataPreparator:
         return frame
     
     def clean_string_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        def strip_series(s: pd.Series) -> pd.Series:
-            return s.astype(str).str.replace(r"\u3000", " ", regex=True).str.strip().replace({"nan": np.nan})
-        for c in df.columns:
-            if df[c].dtype == object:
-                df[c] = strip_series(df[c])
-        return df
+        return strip_object_columns(df)
     
     def parse_birth(self, x):
         if pd.isna(x): return pd.NaT
         if isinstance(x, (int, float)) and not pd.isna(x):
             s = str(int(x))
             return pd.to_datetime(s, format="%Y%m%d", errors="coerce")
-        if isinstance(x, str) and re.fullmatch(r"\d{8}", x):
+        if isinstance(x, str) and YYYYMMDD_RE.fullmatch(x):
             return pd.to_datetime(x, format="%Y%m%d", errors="coerce")
         return pd.to_datetime(x, errors="coerce")
     
@@ -1453,6 +1724,7 @@ class ReportDataPreparator:
             "大田区","世田谷区","渋谷区","中野区","杉並区","豊島区","北区","荒川区","板橋区","練馬区",
             "足立区","葛飾区","江戸川区"
         }
+        if pd.isna(pref): return "その他"
         if pref == "東京都":
             if isinstance(city, str) and any(city.startswith(ku) for ku in tokyo_23):
                 return "東京23区"
@@ -1463,12 +1735,7 @@ class ReportDataPreparator:
         return "その他"
     
     def split_multiselect(self, series: pd.Series) -> pd.Series:
-        return (
-            series.fillna("")
-            .str.replace("\r\n", "\n")
-            .str.split(r"[\n]+", regex=True)
-            .apply(lambda xs: [x.strip() for x in xs if x and x.strip()])
-        )
+        return split_multiselect(series)
     
     def normalize_gender(self, x: str) -> str:
         if pd.isna(x) or str(x).strip() == "":
@@ -1494,6 +1761,146 @@ class ReportDataPreparator:
         return 0 if d == 0 else round(n * 100.0 / d, 1)
 
 
+# 設問セクションの並列生成用ワーカー（pickle 可能なようにモジュールレベルで定義）
+_question_worker_state: Dict[str, object] = {}
+
+def _init_question_worker(component: "QuestionComponent", df: pd.DataFrame, df_eff: pd.DataFrame, n_total: int) -> None:
+    """ワーカープロセスの初期化: タスクごとに DataFrame を再送しないよう保持し、区分ごとの行位置もここで1回だけ求める"""
+    _question_worker_state.update(
+        component=component, df=df, df_eff=df_eff, n_total=n_total, group_positions=component.group_positions(df_eff)
+    )
+
+def _render_question_in_worker(idx: int, q: str, supplement: str) -> str:
+    st = _question_worker_state
+    return st["component"].render_question_section(
+        idx, q, st["df"], st["df_eff"], st["n_total"], supplement, group_positions=st["group_positions"]
+    )
+
+
+# レポートのCSS（差し込む値がないため、レポートごとに組み立てず定数として持つ）
+REPORT_STYLES = """
+  @page { size: A4 portrait; }
+  html, body { }
+  body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Hiragino Kaku Gothic ProN', 'Hiragino Sans', Meiryo, sans-serif; color: #222; }
+  .page { max-width: 180mm; margin: 0 auto; background: white; }
+  h1 { font-size: 18pt; margin: 0 0 8mm; }
+  h2 { font-size: 13pt; margin: 6mm 0 3mm; border-bottom: 2px solid #eee; padding-bottom: 2mm; }
+  section > *:not(h2) { margin-left: 6mm; }
+  h3 { font-size: 11pt; margin: 3mm 0 2mm; }
+  .title { margin: 0 0 6mm; }
+  .title .line1 { font-size: 9pt; color: #555; }
+  .title .line2 { font-size: 20pt; font-weight: 800; margin-top: 1mm; }
+  .muted { color: #777; font-size: 8pt; }
+  .kpis { display: grid; grid-template-columns: repeat(3, 1fr); gap: 8mm; margin-bottom: 6mm; }
+  .kpi { border: 1px solid #e5e5e5; border-radius: 6px; padding: 6mm; }
+  .kpi .label { font-size: 9pt; color: #666; }
+  .kpi .value { font-size: 22pt; font-weight: 700; margin-top: 2mm; }
+  .bars { display: grid; grid-template-columns: 1fr; gap: 3mm; margin-top: 4mm; }
+  .bar { background: #f2f4f8; border: 1px solid #d0d7e2; border-radius: 999px; overflow: hidden; height: 10px; position: relative; }
+  .bar > span { display: block; height: 100%; background: #4c8bf5; }
+  .bar.secondary > span { background: #f58b4c; }
+  .bar.other > span { background: #b5b5b5; }
+  .legend { display: flex; gap: 6mm; flex-wrap: wrap; margin-top: 2mm; font-size: 8pt; color: #555; padding-left: 6mm; }
+  .legend .item::before { content: ''; display: inline-block; width: 10px; height: 10px; border-radius: 2px; margin-right: 4px; vertical-align: middle; }
+  .legend .male::before { background: #4c8bf5; }
+  .legend .female::before { background: #f58b4c; }
+  .legend .other::before { background: #b5b5b5; }
+  table.simple { border-collapse: collapse; width: 100%; font-size: 10pt; }
+  table.simple th, table.simple td { border: 1px solid #e0e0e0; padding: 6px 8px; text-align: right; }
+  table.simple th { background: #f9fafb; color: #444; text-align: center; }
+  table.simple tfoot td { font-weight: 700; background: #fafafa; }
+  table.simple td.label { text-align: left; }
+  .option-pct td { vertical-align: middle; }
+  .option-pct .option-text { width: 80px; writing-mode: vertical-rl; text-align: center; line-height: 1.3; padding: 4px 2px; word-break: keep-all; vertical-align: middle; }
+  .pct-bar { position: relative; height: 12px; background: #f2f4f8; border: 1px solid #d0d7e2; border-radius: 6px; display: flex; align-items: center; }
+  /* 地域別（選択肢×地域の割合）テーブルの棒グラフを細く */
+  table.simple.region-pct .pct-bar { height: 3px; border-radius: 1px; margin: 0; }
+  .pct-bar-fill { position: absolute; top: 0; left: 0; bottom: 0; background: #4c8bf5; display: flex; align-items: center; justify-content: flex-end; }
+  .pct-bar-label { position: absolute; top: 50%; right: 6px; transform: translateY(-50%); font-size: 8pt; color: #333; text-shadow: 0 1px 0 rgba(255,255,255,0.6); }
+  .pct-in-bar { font-size: 8pt; color: white; margin-right: 4px; text-shadow: 0 1px 0 rgba(0,0,0,0.3); }
+  /* 地域別（選択肢×地域の割合）テーブルのパーセンテージ表示を小さく */
+  table.simple.region-pct .pct-in-bar { font-size: 6pt; margin-right: 2px; }
+  table.simple.region-pct .pct-external { font-size: 6pt; }
+  .pct-external { position: absolute; font-size: 8pt; color: #333; white-space: nowrap; top: 50%; transform: translateY(-50%); z-index: 10; }
+  .pct-bar-right { position: absolute; top: 50%; right: 6px; transform: translateY(-50%); font-size: 8pt; color: #333; white-space: nowrap; }
+  /* 地域別（選択肢×地域の割合）テーブルの人数表示も小さく */
+  table.simple.region-pct .pct-bar-right { font-size: 6pt; right: 4px; }
+  table.simple th:nth-child(1), table.simple td:nth-child(1) { width: 28%; }
+  table.simple th:nth-child(2), table.simple td:nth-child(2) { width: 18%; }
+  table.simple th:nth-child(3), table.simple td:nth-child(3) { width: 18%; }
+  table.simple th:nth-child(4), table.simple td:nth-child(4) { width: 18%; }
+  table.simple th:nth-child(5), table.simple td:nth-child(5) { width: 18%; }
+  table.simple.region-pct { table-layout: fixed; }
+  table.simple.region-pct th:nth-child(1), 
+  table.simple.region-pct td:nth-child(1) { width: 50px; min-width: 50px; max-width: 50px; }
+  table.simple.region-pct th:nth-child(2),
+  table.simple.region-pct td:nth-child(2),
+  table.simple.region-pct td:nth-child(1):not(.option-text) { width: 90px; min-width: 90px; max-width: 90px; font-size: 6pt; }
+  table.simple.region-pct th:nth-child(3),
+  table.simple.region-pct td:nth-child(3) { width: auto; }
+  /* 地域別（選択肢×地域の割合）テーブルの行間を狭く */
+  table.simple.region-pct td { padding: 0px 4px; line-height: 0.8; height: 3px; vertical-align: middle; font-size: 7pt; margin: 0; }
+  table.simple.region-pct tr { height: 3px; margin: 0; }
+  table.simple.region-pct { border-spacing: 0; border-collapse: collapse; font-size: 7pt; margin: 0; }
+  table.simple.option-pct td { padding: 3px 8px; }
+  table.simple.region-pct { height: auto; overflow: hidden; }
+  table.simple.region-pct tbody { height: auto; }
+  table.simple.region-pct tr { height: auto; }
+  .overview-list { display: grid; grid-template-columns: 38mm 1fr; column-gap: 6mm; row-gap: 2mm; font-size: 10pt; }
+  .overview-list .label { color: #555; }
+  .overview-list .value { font-weight: 600; }
+  @media print {
+    * { -webkit-print-color-adjust: exact !important; print-color-adjust: exact !important; }
+    html, body { height: auto !important; }
+    .page { max-width: 180mm; min-height: auto; }
+    .page > :last-child { margin-bottom: 0 !important; padding-bottom: 0 !important; }
+    .bar { background: #f2f4f8 !important; border-color: #d0d7e2 !important; }
+    .bar > span { background: #4c8bf5 !important; }
+    .bar.secondary > span { background: #f58b4c !important; }
+    .bar.other > span { background: #b5b5b5 !important; }
+  }
+  section.page-break {
+    break-before: page;
+    page-break-before: always;
+  }
+  .supplement { font-size: 10pt; color: #555; margin: 2mm 0 2mm; white-space: pre-wrap; }
+  .note-box { display: block; max-width: 100%; padding: 3mm 5mm; border: 1px solid #e0e6ef; background: #f7f9fc; border-radius: 8px; }
+  .note-box h3 { margin: 0 0 2mm; }
+  .note-box .options { display: flex; flex-wrap: wrap; gap: 2mm 4mm; align-items: flex-start; }
+  .note-box .option-item { display: inline-flex; white-space: nowrap; font-size: 10pt; }
+  .q-subheading { font-size: 10pt; margin: 3mm 0 2mm; color: #333; }
+  .bar-row { display: flex; align-items: center; gap: 6mm; margin: 0.8mm 0 2.5mm 0; }
+  .bar-container { display: flex; align-items: center; gap: 6mm; margin: 0.8mm 0 2.5mm 0; position: relative; }
+  .bar-content { flex: 1 1 auto; position: relative; }
+  .outside-labels-top { position: relative; margin-bottom: 0; }
+  .outside-labels-bottom { position: relative; margin-top: 0; }
+  .outside-labels-top .label-layer-1 { display: flex; align-items: end; }
+  .outside-labels-bottom .label-layer-1 { display: flex; align-items: start; }
+  .label-layer-1 { height: 12px; position: relative; }
+  .label-layer-2 { height: 16px; position: relative; }
+  .label-layer-3 { height: 16px; position: relative; }
+  .label-layer-4 { height: 16px; position: relative; }
+  .label-layer-5 { height: 16px; position: relative; }
+  .label-layer-6 { height: 16px; position: relative; }
+  .label-layer-7 { height: 16px; position: relative; }
+  .label-layer-8 { height: 16px; position: relative; }
+  .label-layer-9 { height: 16px; position: relative; }
+  .label-layer-10 { height: 16px; position: relative; }
+  .outside-label { position: absolute; font-size: 8pt; color: #333; background: rgba(255,255,255,0.9); 
+    padding: 1px 4px; border-radius: 3px; border: 1px solid #ddd; white-space: nowrap; z-index: 10; }
+  .leader-line { position: absolute; border-left: 1px solid #999; z-index: 5; }
+  .leader-line.to-top { bottom: 0; }
+  .leader-line.to-bottom { top: 0; }
+  .stacked-bar { flex: 1 1 auto; position: relative; height: 16px; border-radius: 8px; overflow: hidden; background: #f2f4f8; border: 1px solid #d0d7e2; }
+  .stacked-bar .seg { position: absolute; top: 0; bottom: 0; display: flex; align-items: center; justify-content: center; white-space: nowrap; font-size: 9pt; color: #fff; padding: 0 4px; }
+  .stacked-bar .seg .seg-label { font-weight: 600; text-shadow: 0 1px 0 rgba(0,0,0,0.25); }
+  .bar-right { flex: 0 0 22mm; font-size: 9pt; color: #444; text-align: right; }
+  .legend2 { display: flex; flex-wrap: wrap; gap: 5mm; font-size: 10pt; font-weight: 600; color: #333; margin: 1mm 0 2mm; padding-left: 6mm; }
+  .legend2 .item { display: inline-flex; align-items: center; gap: 4px; }
+  .legend2 .swatch { width: 10px; height: 10px; border-radius: 2px; display: inline-block; border: 1px solid rgba(0,0,0,0.05); }
+"""
+
+
 # Phase 4: 統合・最適化
 class ReportGenerator:
     """レポート生成の統合クラス"""
@@ -1547,20 +1954,49 @@ class ReportGenerator:
             )
             
             # 設問セクション
-            sections = []
-            for idx, q in enumerate(processed_data.question_columns):
-                section_html = question_component.render_question_section(
-                    idx, q, processed_data.df_original, processed_data.df_effective, processed_data.n_total
-                )
-                sections.append(section_html)
-            question_sections_html = "\n".join(sections)
-            
-            # 6. 最終HTML構築
-            html = self._build_final_html(styles, overview_html, demographics_html, question_sections_html)
-            
-            # 7. 保存
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(html)
+            questions = processed_data.question_columns
+            # 補足説明は全設問分を先にまとめて取得しておく
+            supplements = supplement_texts(processed_data.df_original, questions)
+            supplement_list = [supplements.get(q, "") for q in questions]
+            max_workers = min(self.report_config.max_workers, len(questions))
+            # 6. 最終HTML構築・保存
+            # 設問セクションは生成した順にそのままファイルへ書き出し、全セクションをメモリに溜めない
+            # （途中で失敗しても既存のレポートを壊さないよう、一時ファイルに書いてから置き換える）
+            tmp_path = f"{output_path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+                    if max_workers > 1:
+                        # 設問ごとに独立しているためプロセス並列で生成（DataFrameはワーカー初期化時に1回だけ渡す）
+                        # 補足説明は取得済みのため、元データはワーカーが参照する設問列だけに絞って送る
+                        df_questions = processed_data.df_original.loc[:, processed_data.df_original.columns.isin(questions)]
+                        # 設問数が多い場合はいくつかずつまとめて渡し、プロセス間のやり取りの回数を減らす
+                        chunksize = max(1, len(questions) // (max_workers * 4))
+                        # ワーカーの起動方式は OS の既定のまま（macOS・Windows は spawn）。main.py は import 時に Excel を
+                        # 読み込まない（build_module_summary 参照）ため、spawn でもワーカーの起動は軽い
+                        with ProcessPoolExecutor(
+                            max_workers=max_workers,
+                            initializer=_init_question_worker,
+                            initargs=(question_component, df_questions, processed_data.df_effective, processed_data.n_total),
+                        ) as executor:
+                            sections = executor.map(
+                                _render_question_in_worker, range(len(questions)), questions, supplement_list, chunksize=chunksize
+                            )
+                            f.writelines(self._final_html_parts(styles, overview_html, demographics_html, sections))
+                    else:
+                        # 地域別・学年別の行位置は設問によらないため1回だけ求める
+                        group_positions = question_component.group_positions(processed_data.df_effective)
+                        sections = (
+                            question_component.render_question_section(
+                                idx, q, processed_data.df_original, processed_data.df_effective, processed_data.n_total,
+                                supplement_list[idx], group_positions=group_positions
+                            )
+                            for idx, q in enumerate(questions)
+                        )
+                        f.writelines(self._final_html_parts(styles, overview_html, demographics_html, sections))
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+            os.replace(tmp_path, output_path)
             
             print(f"HTMLレポートを出力しました: {output_path}  （{processed_data.n_total}件、未就学児{processed_data.n_preschool}組を除く）")
             
@@ -1570,131 +2006,15 @@ class ReportGenerator:
     
     def _get_styles(self) -> str:
         """CSSスタイルを取得"""
-        return f"""
-  @page {{ size: A4 portrait; }}
-  html, body {{ }}
-  body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Hiragino Kaku Gothic ProN', 'Hiragino Sans', Meiryo, sans-serif; color: #222; }}
-  .page {{ max-width: 180mm; margin: 0 auto; background: white; }}
-  h1 {{ font-size: 18pt; margin: 0 0 8mm; }}
-  h2 {{ font-size: 13pt; margin: 6mm 0 3mm; border-bottom: 2px solid #eee; padding-bottom: 2mm; }}
-  section > *:not(h2) {{ margin-left: 6mm; }}
-  h3 {{ font-size: 11pt; margin: 3mm 0 2mm; }}
-  .title {{ margin: 0 0 6mm; }}
-  .title .line1 {{ font-size: 9pt; color: #555; }}
-  .title .line2 {{ font-size: 20pt; font-weight: 800; margin-top: 1mm; }}
-  .muted {{ color: #777; font-size: 8pt; }}
-  .kpis {{ display: grid; grid-template-columns: repeat(3, 1fr); gap: 8mm; margin-bottom: 6mm; }}
-  .kpi {{ border: 1px solid #e5e5e5; border-radius: 6px; padding: 6mm; }}
-  .kpi .label {{ font-size: 9pt; color: #666; }}
-  .kpi .value {{ font-size: 22pt; font-weight: 700; margin-top: 2mm; }}
-  .bars {{ display: grid; grid-template-columns: 1fr; gap: 3mm; margin-top: 4mm; }}
-  .bar {{ background: #f2f4f8; border: 1px solid #d0d7e2; border-radius: 999px; overflow: hidden; height: 10px; position: relative; }}
-  .bar > span {{ display: block; height: 100%; background: #4c8bf5; }}
-  .bar.secondary > span {{ background: #f58b4c; }}
-  .bar.other > span {{ background: #b5b5b5; }}
-  .legend {{ display: flex; gap: 6mm; flex-wrap: wrap; margin-top: 2mm; font-size: 8pt; color: #555; padding-left: 6mm; }}
-  .legend .item::before {{ content: ''; display: inline-block; width: 10px; height: 10px; border-radius: 2px; margin-right: 4px; vertical-align: middle; }}
-  .legend .male::before {{ background: #4c8bf5; }}
-  .legend .female::before {{ background: #f58b4c; }}
-  .legend .other::before {{ background: #b5b5b5; }}
-  table.simple {{ border-collapse: collapse; width: 100%; font-size: 10pt; }}
-  table.simple th, table.simple td {{ border: 1px solid #e0e0e0; padding: 6px 8px; text-align: right; }}
-  table.simple th {{ background: #f9fafb; color: #444; text-align: center; }}
-  table.simple tfoot td {{ font-weight: 700; background: #fafafa; }}
-  table.simple td.label {{ text-align: left; }}
-  .option-pct td {{ vertical-align: middle; }}
-  .option-pct .option-text {{ width: 80px; writing-mode: vertical-rl; text-align: center; line-height: 1.3; padding: 4px 2px; word-break: keep-all; vertical-align: middle; }}
-  .pct-bar {{ position: relative; height: 12px; background: #f2f4f8; border: 1px solid #d0d7e2; border-radius: 6px; display: flex; align-items: center; }}
-  /* 地域別（選択肢×地域の割合）テーブルの棒グラフを細く */
-  table.simple.region-pct .pct-bar {{ height: 3px; border-radius: 1px; margin: 0; }}
-  .pct-bar-fill {{ position: absolute; top: 0; left: 0; bottom: 0; background: #4c8bf5; display: flex; align-items: center; justify-content: flex-end; }}
-  .pct-bar-label {{ position: absolute; top: 50%; right: 6px; transform: translateY(-50%); font-size: 8pt; color: #333; text-shadow: 0 1px 0 rgba(255,255,255,0.6); }}
-  .pct-in-bar {{ font-size: 8pt; color: white; margin-right: 4px; text-shadow: 0 1px 0 rgba(0,0,0,0.3); }}
-  /* 地域別（選択肢×地域の割合）テーブルのパーセンテージ表示を小さく */
-  table.simple.region-pct .pct-in-bar {{ font-size: 6pt; margin-right: 2px; }}
-  table.simple.region-pct .pct-external {{ font-size: 6pt; }}
-  .pct-external {{ position: absolute; font-size: 8pt; color: #333; white-space: nowrap; top: 50%; transform: translateY(-50%); z-index: 10; }}
-  .pct-bar-right {{ position: absolute; top: 50%; right: 6px; transform: translateY(-50%); font-size: 8pt; color: #333; white-space: nowrap; }}
-  /* 地域別（選択肢×地域の割合）テーブルの人数表示も小さく */
-  table.simple.region-pct .pct-bar-right {{ font-size: 6pt; right: 4px; }}
-  table.simple th:nth-child(1), table.simple td:nth-child(1) {{ width: 28%; }}
-  table.simple th:nth-child(2), table.simple td:nth-child(2) {{ width: 18%; }}
-  table.simple th:nth-child(3), table.simple td:nth-child(3) {{ width: 18%; }}
-  table.simple th:nth-child(4), table.simple td:nth-child(4) {{ width: 18%; }}
-  table.simple th:nth-child(5), table.simple td:nth-child(5) {{ width: 18%; }}
-  table.simple.region-pct {{ table-layout: fixed; }}
-  table.simple.region-pct th:nth-child(1), 
-  table.simple.region-pct td:nth-child(1) {{ width: 50px; min-width: 50px; max-width: 50px; }}
-  table.simple.region-pct th:nth-child(2),
-  table.simple.region-pct td:nth-child(2),
-  table.simple.region-pct td:nth-child(1):not(.option-text) {{ width: 90px; min-width: 90px; max-width: 90px; font-size: 6pt; }}
-  table.simple.region-pct th:nth-child(3),
-  table.simple.region-pct td:nth-child(3) {{ width: auto; }}
-  /* 地域別（選択肢×地域の割合）テーブルの行間を狭く */
-  table.simple.region-pct td {{ padding: 0px 4px; line-height: 0.8; height: 3px; vertical-align: middle; font-size: 7pt; margin: 0; }}
-  table.simple.region-pct tr {{ height: 3px; margin: 0; }}
-  table.simple.region-pct {{ border-spacing: 0; border-collapse: collapse; font-size: 7pt; margin: 0; }}
-  table.simple.option-pct td {{ padding: 3px 8px; }}
-  table.simple.region-pct {{ height: auto; overflow: hidden; }}
-  table.simple.region-pct tbody {{ height: auto; }}
-  table.simple.region-pct tr {{ height: auto; }}
-  .overview-list {{ display: grid; grid-template-columns: 38mm 1fr; column-gap: 6mm; row-gap: 2mm; font-size: 10pt; }}
-  .overview-list .label {{ color: #555; }}
-  .overview-list .value {{ font-weight: 600; }}
-  @media print {{
-    * {{ -webkit-print-color-adjust: exact !important; print-color-adjust: exact !important; }}
-    html, body {{ height: auto !important; }}
-    .page {{ max-width: 180mm; min-height: auto; }}
-    .page > :last-child {{ margin-bottom: 0 !important; padding-bottom: 0 !important; }}
-    .bar {{ background: #f2f4f8 !important; border-color: #d0d7e2 !important; }}
-    .bar > span {{ background: #4c8bf5 !important; }}
-    .bar.secondary > span {{ background: #f58b4c !important; }}
-    .bar.other > span {{ background: #b5b5b5 !important; }}
-  }}
-  section.page-break {{
-    break-before: page;
-    page-break-before: always;
-  }}
-  .supplement {{ font-size: 10pt; color: #555; margin: 2mm 0 2mm; white-space: pre-wrap; }}
-  .note-box {{ display: block; max-width: 100%; padding: 3mm 5mm; border: 1px solid #e0e6ef; background: #f7f9fc; border-radius: 8px; }}
-  .note-box h3 {{ margin: 0 0 2mm; }}
-  .note-box .options {{ display: flex; flex-wrap: wrap; gap: 2mm 4mm; align-items: flex-start; }}
-  .note-box .option-item {{ display: inline-flex; white-space: nowrap; font-size: 10pt; }}
-  .q-subheading {{ font-size: 10pt; margin: 3mm 0 2mm; color: #333; }}
-  .bar-row {{ display: flex; align-items: center; gap: 6mm; margin: 0.8mm 0 2.5mm 0; }}
-  .bar-container {{ display: flex; align-items: center; gap: 6mm; margin: 0.8mm 0 2.5mm 0; position: relative; }}
-  .bar-content {{ flex: 1 1 auto; position: relative; }}
-  .outside-labels-top {{ position: relative; margin-bottom: 0; }}
-  .outside-labels-bottom {{ position: relative; margin-top: 0; }}
-  .outside-labels-top .label-layer-1 {{ display: flex; align-items: end; }}
-  .outside-labels-bottom .label-layer-1 {{ display: flex; align-items: start; }}
-  .label-layer-1 {{ height: 12px; position: relative; }}
-  .label-layer-2 {{ height: 16px; position: relative; }}
-  .label-layer-3 {{ height: 16px; position: relative; }}
-  .label-layer-4 {{ height: 16px; position: relative; }}
-  .label-layer-5 {{ height: 16px; position: relative; }}
-  .label-layer-6 {{ height: 16px; position: relative; }}
-  .label-layer-7 {{ height: 16px; position: relative; }}
-  .label-layer-8 {{ height: 16px; position: relative; }}
-  .label-layer-9 {{ height: 16px; position: relative; }}
-  .label-layer-10 {{ height: 16px; position: relative; }}
-  .outside-label {{ position: absolute; font-size: 8pt; color: #333; background: rgba(255,255,255,0.9); 
-    padding: 1px 4px; border-radius: 3px; border: 1px solid #ddd; white-space: nowrap; z-index: 10; }}
-  .leader-line {{ position: absolute; border-left: 1px solid #999; z-index: 5; }}
-  .leader-line.to-top {{ bottom: 0; }}
-  .leader-line.to-bottom {{ top: 0; }}
-  .stacked-bar {{ flex: 1 1 auto; position: relative; height: 16px; border-radius: 8px; overflow: hidden; background: #f2f4f8; border: 1px solid #d0d7e2; }}
-  .stacked-bar .seg {{ position: absolute; top: 0; bottom: 0; display: flex; align-items: center; justify-content: center; white-space: nowrap; font-size: 9pt; color: #fff; padding: 0 4px; }}
-  .stacked-bar .seg .seg-label {{ font-weight: 600; text-shadow: 0 1px 0 rgba(0,0,0,0.25); }}
-  .bar-right {{ flex: 0 0 22mm; font-size: 9pt; color: #444; text-align: right; }}
-  .legend2 {{ display: flex; flex-wrap: wrap; gap: 5mm; font-size: 10pt; font-weight: 600; color: #333; margin: 1mm 0 2mm; padding-left: 6mm; }}
-  .legend2 .item {{ display: inline-flex; align-items: center; gap: 4px; }}
-  .legend2 .swatch {{ width: 10px; height: 10px; border-radius: 2px; display: inline-block; border: 1px solid rgba(0,0,0,0.05); }}
-"""
+        return REPORT_STYLES
     
-    def _build_final_html(self, styles: str, overview_html: str, demographics_html: str, question_sections_html: str) -> str:
+    def _build_final_html(self, styles: str, overview_html: str, demographics_html: str, sections: List[str]) -> str:
         """最終HTML文書を構築"""
-        return f"""<!doctype html>
+        return "".join(self._final_html_parts(styles, overview_html, demographics_html, sections))
+    
+    def _final_html_parts(self, styles: str, overview_html: str, demographics_html: str, sections: Iterable[str]) -> Iterator[str]:
+        """最終HTML文書を、先頭・設問セクション（改行区切り）・末尾の断片として順に返す（sections は逐次消費）"""
+        head = f"""<!doctype html>
 <html lang="ja">
 <head>
   <meta charset="utf-8" />
@@ -1708,10 +2028,17 @@ class ReportGenerator:
   <div class="page">
     {overview_html}
     {demographics_html}
-    {question_sections_html}
+    """
+        foot = """
   </div>
 </body>
 </html>"""
+        yield head
+        for i, section_html in enumerate(sections):
+            if i:
+                yield "\n"
+            yield section_html
+        yield foot
 
 
 # Phase 4: 最終形 - 統合されたメインコード
@@ -1751,13 +2078,24 @@ def first_non_empty_value(series: pd.Series):
     """SeriesからNonEmpty最初の値を取得"""
     if series is None:
         return None
-    for v in series:
-        if pd.isna(v):
-            continue
-        s = str(v).strip()
-        if s:
-            return s
-    return None
+    stripped = series.dropna().astype(str).str.strip()
+    stripped = stripped[stripped.ne("")]
+    return stripped.iat[0] if len(stripped) else None
+
+
+def supplement_texts(frame: pd.DataFrame, question_columns: list) -> Dict[str, str]:
+    """設問ごとの補足説明（「補足説明{設問名}」列の最初の非空値）を辞書でまとめて返す"""
+    columns = set(frame.columns)
+    supp_cols = {q: f"補足説明{q}" for q in question_columns}
+    supp_cols = {q: c for q, c in supp_cols.items() if c in columns}
+    # 補足説明列だけを1回で切り出し、以降はその小さいフレームから参照する
+    supp_frame = frame[list(dict.fromkeys(supp_cols.values()))]
+    texts = {}
+    for q, supp_col in supp_cols.items():
+        first_val = first_non_empty_value(supp_frame[supp_col])
+        if first_val is not None:
+            texts[q] = first_val
+    return texts
 
 
 def cell_to_unique_set(val) -> set:
@@ -1767,61 +2105,120 @@ def cell_to_unique_set(val) -> set:
     s = str(val).strip()
     if not s:
         return set()
-    parts = re.split(r"[\r\n]+", s)
-    uniq = []
-    seen = set()
-    for p in parts:
-        t = p.strip()
-        if not t:
-            continue
-        if t not in seen:
-            seen.add(t)
-            uniq.append(t)
-    return set(uniq)
+    # 改行（\r / \n）区切りの各行を strip し、空行を除いた集合（splitlines は \v や \u2028 などでも区切るため使わない）
+    return {t for t in (p.strip() for p in s.replace("\r", "\n").split("\n")) if t}
 
 def is_multiselect(frame: pd.DataFrame, qcol: str) -> bool:
     """複数回答可否の判定（後方互換用）"""
     name = str(qcol)
     if ("複数" in name) or ("複数回答" in name):
         return True
-    series = frame[qcol].dropna()
-    for v in series.head(200):
-        if len(cell_to_unique_set(v)) >= 2:
-            return True
-    return False
+    series = frame[qcol].dropna().head(200).astype(str)
+    # 改行を含むセルだけを対象に、ユニークな選択肢が2つ以上あるセルの有無を判定
+    candidates = series[series.str.contains(r"[\r\n]", regex=True)]
+    if candidates.empty:
+        return False
+    tokens = candidates.reset_index(drop=True).str.findall(OPTION_TOKEN_PATTERN).explode()
+    return bool(tokens.groupby(level=0).nunique().ge(2).any())
 
 # 集計（1グループ）: counts辞書とSを返す
 
 def aggregate_group(frame: pd.DataFrame, qcol: str, options: list):
-    opt_set = set(options)
-    counts = {opt: 0 for opt in options}
-    S = 0
-    for v in frame[qcol].dropna():
-        chosen = [o for o in cell_to_unique_set(v) if o in opt_set]
-        if not chosen:
-            continue
-        for o in chosen:
-            counts[o] += 1
-        S += len(chosen)
+    # セル値をコード化して分解はユニークなセルだけで行い、選択肢ごとの件数は行数の集計（bincount）で求める
+    counts, S, _grouped = aggregate_question(frame[qcol], options, [])
     return counts, S
 
+def aggregate_frames(frames: list, qcol: str, options: list) -> list:
+    """区分ごとのフレーム群 [(name, frame)] を集計し [(name, counts, S)] を返す（同じ区分を複数の描画で共用する）"""
+    return [(name, *aggregate_group(fr, qcol, options)) for name, fr in frames]
+
+def aggregate_question(answers: pd.Series, options: list, groupings: list) -> tuple:
+    """設問列1本を1回だけ走査し、全体と各区分の集計をまとめて求める
+
+    groupings は区分の種類ごとの [(区分名, 行位置の配列)] のリスト（同じ種類の区分同士で行は重ならない）。
+    戻り値は (全体のcounts, 全体のS, 区分の種類ごとの [(区分名, counts, S)])（aggregate_group / aggregate_frames と同じ値）
+    """
+    # セル値をコード化し、ユニークなセルごとに「どの選択肢を含むか」の行列（ユニークセル × 選択肢）を作る
+    codes, uniques = pd.factorize(answers)
+    if not isinstance(answers.dtype, pd.StringDtype):
+        uniques = pd.Index(uniques).astype(str)
+    opt_index = {o: j for j, o in enumerate(options)}
+    chosen = np.zeros((len(uniques), len(options)), dtype=np.int64)
+    for u, v in enumerate(uniques.tolist()):
+        for o in cell_to_unique_set(v):
+            j = opt_index.get(o)
+            if j is not None:
+                chosen[u, j] = 1
+    n_chosen = chosen.sum(axis=1)
+
+    # 全体: ユニークセルごとの行数 × 選択肢行列
+    answered = codes >= 0
+    n_uniques = len(uniques)
+    cell_rows = np.bincount(codes[answered], minlength=n_uniques)
+    overall = (cell_rows @ chosen).tolist()
+    overall_counts = dict(zip(options, overall))
+    S_overall = int(cell_rows @ n_chosen)
+
+    # 区分: 行ごとの区分番号とセルのコードを組にして1回の bincount で（区分 × ユニークセル）の行数を数える
+    grouped = []
+    for groups in groupings:
+        group_ids = np.full(len(codes), -1, dtype=np.int64)
+        for k, (_name, pos) in enumerate(groups):
+            group_ids[pos] = k
+        mask = answered & (group_ids >= 0)
+        group_cell_rows = np.bincount(
+            group_ids[mask] * n_uniques + codes[mask], minlength=len(groups) * n_uniques
+        ).reshape(len(groups), n_uniques)
+        group_counts = (group_cell_rows @ chosen).tolist()
+        group_S = (group_cell_rows @ n_chosen).tolist()
+        grouped.append([
+            (name, dict(zip(options, counts)), S)
+            for (name, _pos), counts, S in zip(groups, group_counts, group_S)
+        ])
+    return overall_counts, S_overall, grouped
+
+# 割合（%）の表示は 0.1% 単位の整数（tenths）で計算する
+# - 浮動小数の除算・round を使わず整数演算のみで四捨五入するため、丸め誤差がない
+def pct_tenths(nums: np.ndarray, denoms: np.ndarray) -> np.ndarray:
+    """分母（最後の軸）ごとの割合を 0.1% 単位の整数で一括計算（分母0は0）"""
+    nums = np.asarray(nums, dtype=np.int64)
+    denoms = np.asarray(denoms, dtype=np.int64)
+    safe = np.where(denoms > 0, denoms, 1)
+    return np.where(denoms > 0, (nums * 1000 + safe // 2) // safe, 0)
+
+def format_tenths(t: int) -> str:
+    """0.1% 単位の整数を "12.3" 形式の文字列にする"""
+    return f"{t // 10}.{t % 10}"
+
+def pct_str(num: int, denom: int) -> str:
+    """割合（%）の表示文字列（小数1桁、分母0は "0.0"）"""
+    if denom == 0:
+        return "0.0"
+    return format_tenths((num * 1000 + denom // 2) // denom)
+
+def counts_to_array(counts: dict, options: list) -> np.ndarray:
+    """counts辞書を options の並び順に揃えた整数配列に変換（描画ループでは位置で参照する）"""
+    return np.fromiter((counts.get(o, 0) for o in options), dtype=np.int64, count=len(options))
+
 # オプションの色割り当て（設問内で一貫）
 # - 「その他」は常に #b5b5b5
 # - それ以外はパレットを順番に
 
+OPTION_PALETTE = (
+    "#4c8bf5", "#f58b4c", "#57b26a", "#9166cc", "#e04f5f",
+    "#39c0cf", "#f2c94c", "#7f8c8d", "#2ecc71", "#e67e22",
+    "#9b59b6", "#1abc9c", "#e84393", "#0984e3", "#6c5ce7"
+)
+
 def color_map_for_options(options: list) -> dict:
-    palette = [
-        "#4c8bf5", "#f58b4c", "#57b26a", "#9166cc", "#e04f5f",
-        "#39c0cf", "#f2c94c", "#7f8c8d", "#2ecc71", "#e67e22",
-        "#9b59b6", "#1abc9c", "#e84393", "#0984e3", "#6c5ce7"
-    ]
+    # 同じ並びの選択肢（同じ選択肢の設問が続く場合など）には同じ辞書を返すため、呼び出し側で変更しないこと
+    return _color_map_for_options(tuple(options))
+
+@lru_cache(maxsize=256)
+def _color_map_for_options(options: tuple) -> dict:
     # その他は最後扱い
     base = [o for o in options if o != "その他"]
-    cmap = {}
-    i = 0
-    for o in base:
-        cmap[o] = palette[i % len(palette)]
-        i += 1
+    cmap = {o: OPTION_PALETTE[i % len(OPTION_PALETTE)] for i, o in enumerate(base)}
     if "その他" in options:
         cmap["その他"] = "#b5b5b5"
     return cmap
@@ -1836,6 +2233,8 @@ def order_options_by_overall(counts: dict, S_overall: int) -> list:
     return sorted(opts, key=key)
 
 # ラベル幅推定機能
+# 割合ラベル（"12.3%" など）は設問・区分をまたいで同じ文字列が繰り返し現れるため、推定結果をキャッシュする
+@lru_cache(maxsize=4096)
 def estimate_label_width_px(text: str, font_size_pt: int = 8) -> float:
     """
     ラベルテキストの推定幅をピクセル単位で計算
@@ -1847,8 +2246,8 @@ def estimate_label_width_px(text: str, font_size_pt: int = 8) -> float:
     # フォントサイズをピクセルに変換（1pt ≈ 1.33px）
     font_size_px = font_size_pt * 1.33
     
-    # 文字種別による幅係数
-    ascii_count = sum(1 for c in text if ord(c) < 128)
+    # 文字種別による幅係数（ASCII以外を落として符号化した長さ = ASCII文字数）
+    ascii_count = len(text.encode("ascii", "ignore"))
     japanese_count = len(text) - ascii_count
     
     # ASCII文字: フォントサイズの約0.6倍, 日本語文字: フォントサイズの約1倍
@@ -1859,6 +2258,7 @@ def estimate_label_width_px(text: str, font_size_pt: int = 8) -> float:
     
     return estimated_width + padding
 
+@lru_cache(maxsize=4096)
 def estimate_label_width_percent(text: str, bar_width_px: float, font_size_pt: int = 8) -> float:
     """
     ラベルテキストの幅を棒グラフ全体に対する割合（%）で計算
@@ -1896,40 +2296,31 @@ def calculate_flexbox_positions(labels_data: list, available_width_percent: floa
         width_percent = estimate_label_width_percent(text, bar_width_px)
         label_widths.append(width_percent)
     
-    # 重なりを検出
+    # 重なりを検出（幅も一緒に持ち回り、調整時に元のラベルを探し直さない）
     positions_and_widths = []
-    for i, (center_pos, text, option) in enumerate(labels_data):
-        width = label_widths[i]
+    for (center_pos, text, option), width in zip(labels_data, label_widths):
         left_edge = center_pos - width / 2
         right_edge = center_pos + width / 2
-        positions_and_widths.append((center_pos, left_edge, right_edge, text, option))
+        positions_and_widths.append((center_pos, left_edge, right_edge, text, option, width))
     
     # 重なりがあるかチェック（余裕を持たせて判定）
     OVERLAP_MARGIN = 2.0  # ラベル間の最小マージン（%）
-    has_significant_overlap = False
-    
-    for i in range(len(positions_and_widths)):
-        for j in range(i + 1, len(positions_and_widths)):
-            left1, right1 = positions_and_widths[i][1], positions_and_widths[i][2]
-            left2, right2 = positions_and_widths[j][1], positions_and_widths[j][2]
-            # マージンを考慮した重なり判定
-            if not (right1 + OVERLAP_MARGIN <= left2 or right2 + OVERLAP_MARGIN <= left1):
-                has_significant_overlap = True
-                break
-        if has_significant_overlap:
-            break
+    # 中心位置順に並べると、どこかの2つが重なっていれば隣り合う2つのどこかも必ず重なるため、
+    # 全ペアではなく隣同士（左のラベルの右端 + マージン > 右のラベルの左端）だけを調べればよい
+    sorted_positions = sorted(positions_and_widths, key=lambda x: x[0])  # center_posでソート
+    has_significant_overlap = any(
+        prev[2] + OVERLAP_MARGIN > cur[1] for prev, cur in zip(sorted_positions, sorted_positions[1:])
+    )
     
     # 重なりがない、または軽微な場合は元の位置を保持
     if not has_significant_overlap:
-        return [(pos, text, option) for pos, _, _, text, option in positions_and_widths]
+        return [(pos, text, option) for pos, _, _, text, option, _ in positions_and_widths]
     
     # 重なりがある場合: 最小限の調整で解決を試行
     # まず、元の位置順序を保持しつつ、最小限の移動で重なりを解消
-    sorted_positions = sorted(positions_and_widths, key=lambda x: x[0])  # center_posでソート
     
     adjusted_positions = []
-    for i, (original_center, _, _, text, option) in enumerate(sorted_positions):
-        width = label_widths[labels_data.index((original_center, text, option))]
+    for i, (original_center, _, _, text, option, width) in enumerate(sorted_positions):
         
         if i == 0:
             # 最初のラベル: 左端制約のみ考慮
@@ -1937,7 +2328,7 @@ def calculate_flexbox_positions(labels_data: list, available_width_percent: floa
         else:
             # 前のラベルとの重なりを避ける最小位置
             prev_pos = adjusted_positions[i-1][0]
-            prev_width = label_widths[labels_data.index((sorted_positions[i-1][0], sorted_positions[i-1][3], sorted_positions[i-1][4]))]
+            prev_width = sorted_positions[i-1][5]
             min_pos = prev_pos + prev_width / 2 + width / 2 + OVERLAP_MARGIN
             
             # 元の位置と最小位置の大きい方を選択（可能な限り元位置に近づける）
@@ -0,0 +1,45 @@
+"""fill_template_excel の集計が、該当者のいない区分（空の学年・地域など）でも失敗しないことの確認"""
+import importlib
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+APP_DIR = Path(__file__).resolve().parents[1]
+QUESTION = "本イベントを何でお知りになりましたか？（複数回答可）"
+
+
+@pytest.fixture(scope="module")
+def fill(tmp_path_factory):
+    # 小学生・中学生と地域がそれぞれ一部の区分にしか存在しないアンケート
+    survey_path = tmp_path_factory.mktemp("survey") / "survey.xlsx"
+    pd.DataFrame({
+        "生年月日": ["2015/05/01", "2015/06/01", "2011/05/01", "2011/07/01"],
+        "性別": ["男", "女", "男性", "女性"],
+        "都道府県": ["東京都", "東京都", "埼玉県", "神奈川県"],
+        "市区町村": ["港区", "港区", "さいたま市", "横浜市"],
+        QUESTION: ["学校\nチラシ", "学校", "Web\nチラシ", None],
+    }).to_excel(survey_path, index=False)
+    # fill_template_excel は `from main import ...` で読み込むため、この fixture の間だけ APP_DIR を import パスに加える
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("SURVEY_EXCEL_FILE", str(survey_path))
+        mp.syspath_prepend(str(APP_DIR))
+        module = importlib.import_module("fill_template_excel")
+        main = importlib.import_module("main")
+        processed = main.ReportDataPreparator(main.ReportConfig()).prepare_data(survey_path)
+        yield module, processed
+
+
+def test_multiple_by_grade_and_region_counts_empty_classes_as_zero(fill):
+    module, processed = fill
+    by_grade = module.get_survey_data_value("multiple", processed, question=1, choices=["学校"], class_type="grade")
+    by_region = module.get_survey_data_value("multiple", processed, question=1, choices=["学校"], class_type="region")
+    # 学校を選んだ2人（2015-05-01・2015-06-01生まれ）は2024年度の小3
+    assert by_grade == [0, 0, 2, 0, 0, 0, 0, 0, 0]
+    assert by_region == [2, 0, 0, 0, 0, 0]
+
+
+def test_responses_with_unused_select_count_is_zero(fill):
+    module, processed = fill
+    series = module.get_survey_data_series("responses:q=1;choice=学校;class=total", processed, select_count=5)
+    assert series == [0]